@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from resolver import ydl_options
+
+# -------------------------
+# Audio Cache Config
+# -------------------------
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR")  # unset = cache disabled
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "1024"))
+AUDIO_CACHE_MIN_PLAYS = int(os.getenv("AUDIO_CACHE_MIN_PLAYS", "3"))  # plays before a track is downloaded
+MAX_TRACKED_PLAYS = 5000  # play counters kept for tracks that aren't cached yet
+INDEX_FILE = "index.json"
+SAVE_DELAY = 5  # seconds; index writes are batched
+
+
+def _download(video_id: str, directory: str) -> dict:
+    """Blocking yt-dlp download of one track's audio. Runs in the download thread."""
+    import yt_dlp  # loaded lazily, like in the resolver
+    opts = ydl_options()
+    opts.update({
+        "format": "bestaudio[acodec=opus]/bestaudio",
+        "outtmpl": os.path.join(directory, "%(id)s.%(ext)s"),
+        "default_search": None,
+    })
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=True)
+        path = ydl.prepare_filename(info)
+    return {"file": os.path.basename(path), "size": os.path.getsize(path), "acodec": info.get("acodec")}
+
+
+def _write_json(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+# -------------------------
+# Audio Cache
+# -------------------------
+class AudioCache:
+    """
+    Optional on-disk cache of frequently played tracks. A track is downloaded once
+    it has been played `min_plays` times; the directory is kept under `max_bytes`
+    by evicting the least recently played files. The index survives restarts.
+    """
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_mb=AUDIO_CACHE_MAX_MB, min_plays=AUDIO_CACHE_MIN_PLAYS):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.min_plays = min_plays
+        self.entries = {}   # video_id -> {"file", "size", "acodec", "last_played"}
+        self.plays = {}     # video_id -> play count (not yet cached)
+        self.downloading = set()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-cache")
+        self.save_handle = None
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = {
+            vid: entry for vid, entry in data.get("entries", {}).items()
+            if os.path.exists(os.path.join(self.directory, entry["file"]))
+        }
+        self.plays = data.get("plays", {})
+
+    def _schedule_save(self):
+        if self.save_handle is None:
+            self.save_handle = asyncio.get_running_loop().call_later(SAVE_DELAY, self._save)
+
+    def _save(self):
+        self.save_handle = None
+        data = {"entries": dict(self.entries), "plays": dict(self.plays)}
+        path = os.path.join(self.directory, INDEX_FILE)
+        asyncio.get_running_loop().run_in_executor(self.executor, _write_json, path, data)
+
+    def __contains__(self, video_id: str):
+        return video_id in self.entries
+
+    def lookup(self, video_id: str):
+        """Return (path, acodec) for a cached track, or None. Counts hits and misses."""
+        if not self.enabled:
+            return None
+        entry = self.entries.get(video_id)
+        if not entry:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry["last_played"] = time.time()
+        self._schedule_save()
+        return os.path.join(self.directory, entry["file"]), entry.get("acodec")
+
+    def record_play(self, video_id: str):
+        """Count a streamed play and start a background download once the track is popular."""
+        if not self.enabled or not video_id:
+            return
+        if video_id in self.entries:
+            return
+        count = self.plays.pop(video_id, 0) + 1
+        self.plays[video_id] = count  # re-insert so the dict stays ordered by recency
+        while len(self.plays) > MAX_TRACKED_PLAYS:
+            self.plays.pop(next(iter(self.plays)))
+        if count >= self.min_plays and video_id not in self.downloading:
+            self.downloading.add(video_id)
+            asyncio.create_task(self._fetch(video_id))
+        self._schedule_save()
+
+    async def _fetch(self, video_id: str):
+        loop = asyncio.get_running_loop()
+        try:
+            entry = await loop.run_in_executor(self.executor, _download, video_id, self.directory)
+        except Exception as e:
+            print(f"❌ Audio cache download failed for {video_id}: {e}")
+            return
+        finally:
+            self.downloading.discard(video_id)
+        entry["last_played"] = time.time()
+        self.entries[video_id] = entry
+        self.plays.pop(video_id, None)
+        self._evict()
+        self._schedule_save()
+
+    def _evict(self):
+        total = sum(e["size"] for e in self.entries.values())
+        for video_id, entry in sorted(self.entries.items(), key=lambda kv: kv[1]["last_played"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            del self.entries[video_id]
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "files": len(self.entries),
+            "bytes": sum(e["size"] for e in self.entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+audio_cache = AudioCache()
@@ -1,43 +1,39 @@
+import time
+STARTED_AT = time.perf_counter()  # for the startup timing report
+
 from dotenv import load_dotenv
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ui import View, Button
 import os
-import json, requests
+import json
+import asyncio
+import aiohttp
+
+# Load .env before our modules read their config at import time
+load_dotenv()
 
 from tickets import setup as setup_tickets
-from spotify import get_spotify_token, create_spotify_artist_embed, get_latest_albums, create_spotify_view
-from youtube import get_latest_video, create_youtube_video_embed, create_youtube_view
+from spotify import create_spotify_artist_embed, get_latest_albums, create_spotify_view, find_artist, get_top_tracks
+from youtube import UploadWatcher, create_youtube_video_embed, create_youtube_view
 from lyrics import fetch_lyrics, paginate_lyrics, LyricsPaginator, create_lyrics_embed
-from music import setup as setup_music
+from music import setup as setup_music, players
+from release_watcher import ReleaseWatcher
+from http_client import http_client
+from welcome import WelcomePipeline
+from guild_config import setup as setup_guild_config, config_channel, member_mention, is_staff, resolve_member
 
 # -------------------------
-# Load Environment Variables
+# Environment Variables
 # -------------------------
-load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE_API_CHANNEL_ID = os.getenv("YOUTUBE_API_CHANNEL_ID")  # Your YouTube channel ID
-
-# -------------------------
-# Role & Channel IDs
-# -------------------------
-MODERATOR_ROLE_ID = 1407630846294491169
-ARTIST_ROLE_ID = 1407630978469466112
-ADMIN_ROLE_ID = 1407630846294491170
-
-SPOTIFY_ANNOUNCEMENT_CHANNEL_ID = 1407641244263514194
-YOUTUBE_CHANNEL_ID = 1408315008324079726  # Discord channel for YouTube posts
-GENERAL_ANNOUNCEMENT_CHANNEL_ID = 1407630847703781426
-
-# -------------------------
-# Ticket Config
-# -------------------------
-TICKET_CHANNEL_ID = 1407630847703781427
-TICKET_LOG_CHANNEL_ID = 1407656944164016138
-TICKET_TIMEOUT = 3600  # 1 hour
+YOUTUBE_API_CHANNEL_ID = os.getenv("YOUTUBE_API_CHANNEL_ID")  # Your YouTube channel ID(s), comma separated
+BOT_SHARD_COUNT = os.getenv("BOT_SHARD_COUNT")  # total shards across all processes; unset = one unsharded process
+BOT_SHARD_IDS = os.getenv("BOT_SHARD_IDS")      # shards run by this process, e.g. "0,1" (needs BOT_SHARD_COUNT); unset = all of them
+BOT_CACHE_PROFILE = os.getenv("BOT_CACHE_PROFILE", "full")  # "lean": no member chunking, only voice members cached
 
 # -------------------------
 # Intents & Bot Setup
@@ -45,52 +41,46 @@ TICKET_TIMEOUT = 3600  # 1 hour
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
-intents.members = True
+intents.members = True  # still needed for on_member_join, even in the lean profile
 
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+bot_options = {"command_prefix": "!", "intents": intents, "help_command": None}
+if BOT_CACHE_PROFILE == "lean":
+    # Members come with every message/interaction/join payload, and anyone else is
+    # fetched on demand; only members in voice are kept so music can find them.
+    member_cache = discord.MemberCacheFlags.none()
+    member_cache.voice = True
+    bot_options.update(chunk_guilds_at_startup=False, member_cache_flags=member_cache)
 
-# -------------------------
-# Globals
-# -------------------------
-SPOTIFY_ACCESS_TOKEN = None
-latest_spotify_release = None
-latest_youtube_video = None
+if BOT_SHARD_IDS and not BOT_SHARD_COUNT:
+    raise SystemExit("❌ BOT_SHARD_IDS is set but BOT_SHARD_COUNT is not: set the total number of shards across all processes")
 
-MEMBER_ROLE_ID = 1407630846294491168
-ROLE_MENTION = f"<@&{MEMBER_ROLE_ID}>"
-WELCOME_CHANNEL_ID = 1407736229994430475
+if BOT_SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        shard_count=int(BOT_SHARD_COUNT),
+        shard_ids=[int(s) for s in BOT_SHARD_IDS.split(",")] if BOT_SHARD_IDS else None,
+        **bot_options
+    )
+else:
+    bot = commands.Bot(**bot_options)
 
 # -------------------------
 # Welcome Event
 # -------------------------
+# Role assignment and welcome messages run in the background; bursts get one combined welcome
+welcome_pipeline = WelcomePipeline()
+
 @bot.event
 async def on_member_join(member):
-    role = member.guild.get_role(MEMBER_ROLE_ID)
-    if role:
-        try:
-            await member.add_roles(role)
-        except discord.Forbidden:
-            print(f"Cannot assign role to {member}.")
-
-    channel = member.guild.get_channel(WELCOME_CHANNEL_ID)
-    if channel:
-        embed = discord.Embed(
-            title="🎉 Welcome!",
-            description=f"👋 Hello {member.mention}, welcome to **{member.guild.name}**!",
-            color=discord.Color.green()
-        )
-        embed.set_thumbnail(url=member.display_avatar.url)
-        embed.set_footer(text="Enjoy your stay!")
-        await channel.send(embed=embed)
+    welcome_pipeline.enqueue(member)
 
 # -------------------------
 # Commands
 # -------------------------
 @bot.command(name="announce")
 async def announce(ctx, *, message):
-    if any(role.id in [MODERATOR_ROLE_ID, ARTIST_ROLE_ID, ADMIN_ROLE_ID] for role in ctx.author.roles):
+    if is_staff(await resolve_member(ctx.guild, ctx.author)):
         embed = discord.Embed(title="📢 Announcement", description=message, color=0x2ecc71)
-        await ctx.send(content=ROLE_MENTION, embed=embed)
+        await ctx.send(content=member_mention(ctx.guild), embed=embed)
         try: await ctx.message.delete()
         except discord.Forbidden: pass
     else:
@@ -98,61 +88,90 @@ async def announce(ctx, *, message):
 
 @bot.command(name="post")
 async def post(ctx, *, message):
-    if any(role.id in [MODERATOR_ROLE_ID, ARTIST_ROLE_ID, ADMIN_ROLE_ID] for role in ctx.author.roles):
+    if is_staff(await resolve_member(ctx.guild, ctx.author)):
         embed = discord.Embed(description=message, color=0x2ecc71)
-        await ctx.send(content=ROLE_MENTION, embed=embed)
+        await ctx.send(content=member_mention(ctx.guild), embed=embed)
         try: await ctx.message.delete()
         except discord.Forbidden: pass
     else:
         await ctx.send("⛔ You don't have permission.")
 
+# --- Upstream Health
+@bot.command(name="netstats")
+async def netstats(ctx):
+    """Per-host latency, error rate, retries and circuit state of the shared HTTP client."""
+    if not is_staff(await resolve_member(ctx.guild, ctx.author), ("moderator_role", "admin_role")):
+        return await ctx.send("⛔ You don't have permission.")
+    embed = discord.Embed(title="🌐 Upstream APIs", color=discord.Color.blue())
+    for host, s in http_client.stats().items():
+        embed.add_field(
+            name=f"{'🟢' if s['circuit'] == 'closed' else '🔴'} {host}",
+            value=f"{s['requests']} req · {s['error_rate']:.1%} errors · {s['retries']} retries · "
+                  f"{s['rejected']} rejected\navg {s['avg_ms']} ms · max {s['max_ms']} ms",
+            inline=False
+        )
+    if not embed.fields:
+        embed.description = "No requests yet."
+    await ctx.send(embed=embed)
+
+@bot.command(name="welcomestats")
+async def welcomestats(ctx):
+    """Role queue depth and join-to-role lag of the welcome pipeline."""
+    if not is_staff(await resolve_member(ctx.guild, ctx.author), ("moderator_role", "admin_role")):
+        return await ctx.send("⛔ You don't have permission.")
+    s = welcome_pipeline.stats()
+    embed = discord.Embed(title="👋 Welcome Pipeline", color=discord.Color.green())
+    embed.add_field(name="Role queue", value=f"{s['role_queue']} waiting · {s['current_lag']}s behind", inline=False)
+    embed.add_field(name="Join → role", value=f"p50 {s['lag_p50']}s · max {s['lag_max']}s", inline=False)
+    embed.add_field(
+        name="Totals",
+        value=f"{s['assigned']} assigned · {s['failed']} failed · {s['batches']} batched welcomes · "
+              f"{s['welcomes_pending']} pending",
+        inline=False
+    )
+    await ctx.send(embed=embed)
+
 # --- Spotify Search
 @bot.command(name="search")
 async def search(ctx, *, artist_name):
     """Search Spotify for an artist and post a nice embed with top tracks and albums."""
-    global SPOTIFY_ACCESS_TOKEN
-    if not SPOTIFY_ACCESS_TOKEN:
-        SPOTIFY_ACCESS_TOKEN = get_spotify_token()
-    
-    headers = {"Authorization": f"Bearer {SPOTIFY_ACCESS_TOKEN}"}
-    search_url = f"https://api.spotify.com/v1/search?q={artist_name}&type=artist&limit=1"
-    resp = requests.get(search_url, headers=headers).json()
-    items = resp.get("artists", {}).get("items", [])
-    
-    if not items:
-        return await ctx.send("🎵 Artist not found.")
-
-    artist = items[0]
-    artist_id = artist["id"]
-
-    # Get top tracks
-    top_tracks_data = requests.get(
-        f"https://api.spotify.com/v1/artists/{artist_id}/top-tracks?market=US", headers=headers
-    ).json()
-    top_tracks = [
-        f"🎵 [{t['name']}]({t['external_urls']['spotify']})"
-        for t in top_tracks_data.get("tracks", [])[:5]
-    ]
-
-    # Get latest albums with 3+ tracks
-    latest_albums = get_latest_albums(artist_id, SPOTIFY_ACCESS_TOKEN, limit=5)
+    try:
+        artist = await find_artist(artist_name)
+        if not artist:
+            return await ctx.send("🎵 Artist not found.")
+
+        # Top tracks and latest albums (3+ tracks) are independent, so fetch them together
+        top_tracks, latest_albums = await asyncio.gather(
+            get_top_tracks(artist["id"]),
+            get_latest_albums(artist["id"], limit=5)
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"❌ Spotify API Error: {e}")
+        return await ctx.send("❌ Spotify is not reachable right now, try again later.")
 
     # Create embed and view
-    embed = create_spotify_artist_embed(artist, top_tracks, latest_albums)
+    mention = member_mention(ctx.guild)
+    embed = create_spotify_artist_embed(artist, top_tracks, latest_albums, role_mention=mention)
     view = create_spotify_view(artist)
 
     # Send embed with role mention
-    await ctx.send(content=ROLE_MENTION, embed=embed, view=view)
+    await ctx.send(content=mention, embed=embed, view=view)
 
 # --- Lyrics
 @bot.command()
-async def lyrics(ctx, *, query: str):
+async def lyrics(ctx, *, query: str = None):
     """
     Usage: !lyrics <artist> - <song>
     Example: !lyrics Adele - Hello
+    A bare !lyrics shows the song that is playing (usually already cached).
     """
     async with ctx.typing():
-        if "-" in query:
+        if not query:
+            player = players.get(ctx.guild.id) if ctx.guild else None
+            if not player or not player.lyrics_query or not player.lyrics_query[1]:
+                return await ctx.send("🎤 Nothing is playing. Usage: `!lyrics <artist> - <song>`")
+            artist_name, song_name = player.lyrics_query
+        elif "-" in query:
             artist_name, song_name = map(str.strip, query.split("-", 1))
         else:
             artist_name = None
@@ -174,11 +193,14 @@ async def help_command(ctx):
         description="Available commands:",
         color=discord.Color.blue()
     )
+    embed.add_field(name="⚙️ Server Config",
+                    value="`!config` - Admin: show roles/channels\n`!config set <key> <@role|#channel>` / `!config reset <key>`",
+                    inline=False)
     embed.add_field(name="🎟️ Ticket System",
                     value="`!setup_tickets` - Admin: post ticket panel\nClick buttons to open tickets",
                     inline=False)
     embed.add_field(name="📢 Announcements",
-                    value="`!announce <message>` - Staff only\n`!post <message>` - Staff only",
+                    value="`!announce <message>` - Staff only\n`!post <message>` - Staff only\n`!netstats` - Staff: upstream API health\n`!welcomestats` - Staff: join queue and lag",
                     inline=False)
     embed.add_field(name="🎵 Music / Spotify",
                     value="`!search <artist>` - Show artist info\n`!play <song>` - Play song\n`!skip/!stop/!prev/!next/!volume <1-100>` - Controls",
@@ -186,73 +208,132 @@ async def help_command(ctx):
     embed.add_field(name="🎬 YouTube",
                     value="Automated new video posts with Open button",
                     inline=False)
-    embed.add_field(name="🎤 Lyrics", value="`!lyrics <artist> - <song>` - Fetch full lyrics", inline=False)
+    embed.add_field(name="🎤 Lyrics", value="`!lyrics <artist> - <song>` - Fetch full lyrics\n`!lyrics` - Lyrics of the song that's playing", inline=False)
     embed.set_footer(text="Powered by YelziciansBot 🎶")
     await ctx.send(embed=embed)
 
 # -------------------------
 # Automated Tasks
 # -------------------------
-@tasks.loop(minutes=10)
-async def check_new_releases():
-    global latest_spotify_release
-    headers = {"Authorization": f"Bearer {SPOTIFY_ACCESS_TOKEN}"}
-    artist_id = "6rhenHsRHjPnQIcawW67VQ"
-    data = requests.get(f"https://api.spotify.com/v1/artists/{artist_id}/albums?include_groups=single,album&limit=1", headers=headers).json()
-    if "items" not in data or not data["items"]:
-        return
-    album = data["items"][0]
-    album_id = album["id"]
-    if latest_spotify_release != album_id:
-        latest_spotify_release = album_id
-        channel = bot.get_channel(SPOTIFY_ANNOUNCEMENT_CHANNEL_ID)
+def announcement_channels(key):
+    """Every guild's configured channel for an announcement type."""
+    for guild in bot.guilds:
+        channel = config_channel(guild, key)
         if channel:
-            embed = discord.Embed(
-                title="🎵 New Release!",
-                description=f"**{album['name']}** is out!\n[Listen here]({album['external_urls']['spotify']})",
-                color=discord.Color.green()
-            )
-            view = create_spotify_view(album)
-            await channel.send(content=ROLE_MENTION, embed=embed, view=view)
-
-@tasks.loop(minutes=10)
-async def check_youtube():
-    global latest_youtube_video
-    video = get_latest_video(YOUTUBE_API_CHANNEL_ID)
-    if not video:
-        return
-    
+            yield guild, channel
+
+async def announce_release(artist, album):
+    artist_name = artist.get("name") or album.get("artists", [{}])[0].get("name", "")
+    embed = discord.Embed(
+        title="🎵 New Release!",
+        description=f"**{album['name']}** by {artist_name} is out!\n[Listen here]({album['external_urls']['spotify']})",
+        color=discord.Color.green()
+    )
+    if artist.get("images"):
+        embed.set_thumbnail(url=artist["images"][0]["url"])
+    for guild, channel in announcement_channels("spotify_channel"):
+        try:
+            await channel.send(content=member_mention(guild), embed=embed, view=create_spotify_view(album))
+        except discord.HTTPException as e:
+            print(f"❌ Release announcement failed in {guild}: {e}")
+
+# Polls every artist in followed_artists.json, spread over the interval
+release_watcher = ReleaseWatcher(announce_release)
+
+async def announce_video(video):
     video_id = video["id"].get("videoId")
-    if video_id and latest_youtube_video != video_id:
-        latest_youtube_video = video_id
-        channel = bot.get_channel(YOUTUBE_CHANNEL_ID)
-        if channel:
-            embed = create_youtube_video_embed(video, role_mention=ROLE_MENTION)
-            view = create_youtube_view(video_id)
-            await channel.send(content=ROLE_MENTION, embed=embed, view=view)
-            
+    if not video_id:
+        return
+    for guild, channel in announcement_channels("youtube_channel"):
+        mention = member_mention(guild)
+        embed = create_youtube_video_embed(video, role_mention=mention)
+        try:
+            await channel.send(content=mention, embed=embed, view=create_youtube_view(video_id))
+        except discord.HTTPException as e:
+            print(f"❌ Video announcement failed in {guild}: {e}")
+
+# YOUTUBE_API_CHANNEL_ID may list several channels, comma separated
+youtube_watcher = UploadWatcher(announce_video, (YOUTUBE_API_CHANNEL_ID or "").split(","))
+
 # -------------------------
 # Bot Startup
 # -------------------------
+startup_timings = []   # (step, seconds) for the startup report
+ready_count = 0
+disconnected_at = None
+
+async def timed(step, coro):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        startup_timings.append((step, time.perf_counter() - started))
+
 @bot.event
-async def on_ready():
-    global SPOTIFY_ACCESS_TOKEN
-    SPOTIFY_ACCESS_TOKEN = get_spotify_token()
-    print(f"✅ Logged in as {bot.user}")
-
-    # Start background tasks
-    check_new_releases.start()
-    check_youtube.start()
-    
+async def setup_hook():
+    """Runs once per process, before the gateway connects; on_ready fires again on every reconnect."""
+    started = time.perf_counter()
+    startup_timings.append(("imports", started - STARTED_AT))
+
+    # Per-guild roles and channels (!config)
+    await timed("config", setup_guild_config(bot))
+
     # Setup music system
-    await setup_music(bot)
+    await timed("music", setup_music(bot))
 
     # Setup ticket system
     try:
-        await setup_tickets(bot)
+        await timed("tickets", setup_tickets(bot))
         print("✅ Ticket System is running")
     except Exception as e:
         print(f"❌ Ticket System failed to load: {e}")
 
+    welcome_pipeline.start()
+    startup_timings.append(("setup_hook", time.perf_counter() - started))
+    asyncio.create_task(start_pollers())
+
+async def start_pollers():
+    """Release and upload polling only starts once the gateway is ready (they post to channels)."""
+    await bot.wait_until_ready()
+    release_watcher.start()
+    youtube_watcher.start()
+
+@bot.event
+async def on_ready():
+    global ready_count
+    ready_count += 1
+    if ready_count == 1:
+        now = time.perf_counter()
+        steps = " · ".join(f"{step} {seconds:.2f}s" for step, seconds in startup_timings)
+        gateway = now - STARTED_AT - sum(seconds for step, seconds in startup_timings if step in ("imports", "setup_hook"))
+        shards = f"shards {sorted(bot.shards)} of {bot.shard_count}" if bot.shard_count else "unsharded"
+        print(f"✅ Logged in as {bot.user} ({len(bot.guilds)} guilds, {shards}, {BOT_CACHE_PROFILE} cache)")
+        print(f"⏱️ Startup: {steps} · gateway {gateway:.2f}s · total {now - STARTED_AT:.2f}s")
+    else:
+        took = f" after {time.perf_counter() - disconnected_at:.2f}s" if disconnected_at else ""
+        print(f"🔁 Gateway ready again{took} (reconnect #{ready_count - 1}), nothing to set up")
+
+@bot.event
+async def on_disconnect():
+    global disconnected_at
+    disconnected_at = time.perf_counter()
+
+@bot.event
+async def on_resumed():
+    took = f" in {time.perf_counter() - disconnected_at:.2f}s" if disconnected_at else ""
+    print(f"🔁 Session resumed{took}")
+
+# -------------------------
+# Bot Shutdown
+# -------------------------
+close_gateway = bot.close
+
+async def close():
+    """Close the shared HTTP pools (Spotify, YouTube, lyrics) before the gateway goes down."""
+    await http_client.close()
+    await close_gateway()
+
+bot.close = close
+
 # Run the bot
-bot.run(DISCORD_TOKEN)
+bot.run(DISCORD_TOKEN)
\ No newline at end of file
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+# -------------------------
+# TTL + LRU Cache
+# -------------------------
+class TTLCache:
+    """
+    Small in-memory LRU cache where every entry carries its own expiry.
+    Not thread-safe: only use it from the event loop.
+    """
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self.data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.data[key]
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self.data.pop(key, None)
+            return
+        self.data[key] = (time.monotonic() + ttl, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self.data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key):
+        entry = self.data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self):
+        return {"size": len(self.data), "hits": self.hits, "misses": self.misses}
+
+# -------------------------
+# Response Cache
+# -------------------------
+class ResponseCache:
+    """
+    Cache for upstream API responses with per-call TTLs, LRU eviction under a
+    byte budget and serve-stale-while-revalidate: once an entry is past its TTL
+    but still inside its stale window, the old value is returned immediately and
+    one background refresh is started. Concurrent misses share one fetch.
+    """
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.data = OrderedDict()  # key -> (fresh_until, stale_until, size, value)
+        self.bytes = 0
+        self.inflight = {}         # key -> asyncio.Task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _store(self, key, value, ttl, stale_ttl):
+        self._remove(key)
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes or ttl <= 0:
+            return
+        now = time.monotonic()
+        self.data[key] = (now + ttl, now + ttl + stale_ttl, size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, old_size, _) = self.data.popitem(last=False)
+            self.bytes -= old_size
+
+    def _remove(self, key):
+        entry = self.data.pop(key, None)
+        if entry:
+            self.bytes -= entry[2]
+
+    def _fetch(self, key, fetch, ttl, stale_ttl):
+        task = self.inflight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    value = await fetch()
+                    self._store(key, value, ttl(value) if callable(ttl) else ttl, stale_ttl)
+                    return value
+                finally:
+                    self.inflight.pop(key, None)
+            task = self.inflight[key] = asyncio.create_task(run())
+        return task
+
+    async def get_or_fetch(self, key, fetch, ttl, stale_ttl=0):
+        """
+        Return the cached value for key, or await fetch() and cache its result.
+        `ttl` may be a number or a function of the fetched value.
+        """
+        entry = self.data.get(key)
+        now = time.monotonic()
+        if entry:
+            fresh_until, stale_until, _, value = entry
+            if now < fresh_until:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return value
+            if now < stale_until:
+                self.data.move_to_end(key)
+                self.stale_hits += 1
+                task = self._fetch(key, fetch, ttl, stale_ttl)
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())  # background errors are dropped
+                return value
+            self._remove(key)
+        self.misses += 1
+        return await asyncio.shield(self._fetch(key, fetch, ttl, stale_ttl))
+
+    def stats(self):
+        return {
+            "entries": len(self.data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
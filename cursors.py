@@ -0,0 +1,66 @@
+import json
+import os
+
+# -------------------------
+# Cursor Store Config
+# -------------------------
+CURSORS_PATH = os.getenv("ANNOUNCE_CURSORS_PATH", "announce_cursors.json")
+
+
+def newer_than(items, cursor, get_id, get_date):
+    """
+    Split a page of items against a cursor ({"date": ..., "ids": [...]}).
+    Returns (new items oldest first, advanced cursor). With no cursor yet the
+    page only seeds one, so a first run never announces old items.
+    """
+    items = sorted(items, key=get_date)
+    if not items:
+        return [], cursor
+    newest_date = get_date(items[-1])
+    advanced = {"date": newest_date, "ids": [get_id(i) for i in items if get_date(i) == newest_date]}
+    if cursor is None:
+        return [], advanced
+
+    seen_ids = set(cursor.get("ids", []))
+    new = [
+        i for i in items
+        if get_date(i) > cursor["date"] or (get_date(i) == cursor["date"] and get_id(i) not in seen_ids)
+    ]
+    if not new:
+        return [], cursor
+    if newest_date == cursor["date"]:
+        advanced["ids"] = sorted(seen_ids | set(advanced["ids"]))
+    return new, advanced
+
+# -------------------------
+# Cursor Store
+# -------------------------
+class CursorStore:
+    """
+    Last-announced position per source ("spotify:<artist>", "youtube:<channel>"),
+    kept in a small JSON file that is replaced atomically on every change.
+    """
+    def __init__(self, path=CURSORS_PATH):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.cursors = json.load(f)
+        except (OSError, ValueError):
+            self.cursors = {}
+
+    def get(self, key):
+        return self.cursors.get(key)
+
+    def set(self, key, cursor):
+        if self.cursors.get(key) == cursor:
+            return
+        self.cursors[key] = cursor
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.cursors, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+cursors = CursorStore()
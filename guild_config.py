@@ -0,0 +1,189 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import discord
+from discord.ext import commands
+
+# -------------------------
+# Guild Config
+# -------------------------
+GUILD_CONFIG_PATH = os.getenv("GUILD_CONFIG_PATH", "guild_config.db")
+
+# key -> (kind, fallback). Fallbacks are the IDs of the community this bot was
+# first built for; snowflakes are global, so they never resolve in another guild.
+SETTINGS = {
+    "moderator_role":     ("role", 1407630846294491169),
+    "artist_role":        ("role", 1407630978469466112),
+    "admin_role":         ("role", 1407630846294491170),
+    "member_role":        ("role", 1407630846294491168),  # given on join and pinged by announcements
+    "welcome_channel":    ("channel", 1407736229994430475),
+    "spotify_channel":    ("channel", 1407641244263514194),  # new release posts
+    "youtube_channel":    ("channel", 1408315008324079726),  # new video posts
+    "ticket_channel":     ("channel", 1407630847703781427),
+    "ticket_log_channel": ("channel", 1407656944164016138),
+}
+STAFF_ROLES = ("moderator_role", "artist_role", "admin_role")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, key)
+);
+"""
+
+
+class GuildConfigStore:
+    """
+    Per-guild role and channel IDs in SQLite, read through an in-memory cache:
+    a guild's settings are loaded on first use and every later read is a dict
+    lookup. Writes (admin commands only) go straight to the database.
+    """
+    def __init__(self, path=GUILD_CONFIG_PATH):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.cache = {}  # guild_id -> {key: value} of explicitly set values
+
+    def _load(self, guild_id):
+        values = self.cache.get(guild_id)
+        if values is None:
+            with self.lock:
+                rows = self.db.execute("SELECT key, value FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchall()
+            values = self.cache[guild_id] = {key: value for key, value in rows if key in SETTINGS}
+        return values
+
+    def get(self, guild_id, key):
+        value = self._load(guild_id).get(key)
+        return SETTINGS[key][1] if value is None else value
+
+    def settings(self, guild_id) -> dict:
+        """key -> (value, set explicitly?) for every known setting."""
+        values = self._load(guild_id)
+        return {key: (values.get(key, fallback), key in values) for key, (_, fallback) in SETTINGS.items()}
+
+    def set(self, guild_id, key, value):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO guild_settings VALUES (?, ?, ?, ?)", (guild_id, key, value, int(time.time()))
+            )
+            self.db.commit()
+        self._load(guild_id)[key] = value
+
+    def reset(self, guild_id, key):
+        with self.lock:
+            self.db.execute("DELETE FROM guild_settings WHERE guild_id = ? AND key = ?", (guild_id, key))
+            self.db.commit()
+        self._load(guild_id).pop(key, None)
+
+
+guild_config = GuildConfigStore()
+
+# -------------------------
+# Lookup Helpers
+# -------------------------
+def config_channel(guild, key):
+    """The guild's configured channel for key, or None when unset or not in this guild."""
+    return guild.get_channel(guild_config.get(guild.id, key)) if guild else None
+
+
+def config_role(guild, key):
+    return guild.get_role(guild_config.get(guild.id, key)) if guild else None
+
+
+def member_mention(guild) -> str:
+    """Ping for the guild's member role, or "" when it has none."""
+    role = config_role(guild, "member_role")
+    return role.mention if role else ""
+
+
+async def get_member(guild, user_id):
+    """
+    Cached member, else one API fetch (the lean cache profile doesn't keep
+    members around). None if they are no longer in the guild.
+    """
+    member = guild.get_member(user_id)
+    if member is None:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.HTTPException:
+            return None
+    return member
+
+
+async def resolve_member(guild, user):
+    """`user` as a Member with roles, fetching it only when we were handed a plain User."""
+    if isinstance(user, discord.Member) or guild is None:
+        return user
+    return await get_member(guild, user.id) or user
+
+
+def is_staff(member, keys=STAFF_ROLES) -> bool:
+    guild = getattr(member, "guild", None)
+    if guild is None:
+        return False
+    wanted = {guild_config.get(guild.id, key) for key in keys}
+    return any(role.id in wanted for role in member.roles)
+
+# -------------------------
+# Config Commands
+# -------------------------
+class GuildConfigCommands(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.group(name="config", invoke_without_command=True)
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def config(self, ctx):
+        """Show this server's roles and channels"""
+        embed = discord.Embed(title="⚙️ Server Config", color=discord.Color.blue())
+        lines = []
+        for key, (value, explicit) in guild_config.settings(ctx.guild.id).items():
+            kind = SETTINGS[key][0]
+            target = ctx.guild.get_role(value) if kind == "role" else ctx.guild.get_channel(value)
+            shown = target.mention if target else "*not set*"
+            lines.append(f"`{key}` → {shown}{'' if explicit or not target else ' (default)'}")
+        embed.description = "\n".join(lines)
+        embed.set_footer(text="!config set <key> <@role|#channel|ID> • !config reset <key>")
+        await ctx.send(embed=embed)
+
+    @config.command(name="set")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def config_set(self, ctx, key: str, *, value: str):
+        """Set a role or channel for this server"""
+        key = key.lower()
+        if key not in SETTINGS:
+            return await ctx.send(f"❌ Unknown key. Keys: {', '.join(f'`{k}`' for k in SETTINGS)}")
+        match = re.search(r"\d{15,20}", value)
+        kind = SETTINGS[key][0]
+        target = None
+        if match:
+            target_id = int(match.group())
+            target = ctx.guild.get_role(target_id) if kind == "role" else ctx.guild.get_channel(target_id)
+        if target is None:
+            return await ctx.send(f"❌ That is not a {kind} in this server.")
+        guild_config.set(ctx.guild.id, key, target.id)
+        await ctx.send(f"✅ `{key}` is now {target.mention}")
+
+    @config.command(name="reset")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def config_reset(self, ctx, key: str):
+        """Go back to the default for a key"""
+        key = key.lower()
+        if key not in SETTINGS:
+            return await ctx.send(f"❌ Unknown key. Keys: {', '.join(f'`{k}`' for k in SETTINGS)}")
+        guild_config.reset(ctx.guild.id, key)
+        await ctx.send(f"✅ `{key}` reset.")
+
+
+async def setup(bot):
+    await bot.add_cog(GuildConfigCommands(bot))
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+# -------------------------
+# HTTP Client Config
+# -------------------------
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))   # keep-alive connections per upstream
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))             # seconds per attempt
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))                # extra attempts for idempotent requests
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+MAX_RETRY_AFTER = 30      # a longer Retry-After fails the call instead of holding it open
+BREAKER_FAILURES = 5      # consecutive failures that open a host's circuit
+BREAKER_COOLDOWN = 30     # seconds an open circuit rejects calls before one probe is let through
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised without touching the network while an upstream's circuit is open."""
+
+
+def retry_after_seconds(headers):
+    """Seconds from a Retry-After header, or None (only the delta-seconds form is used by our APIs)."""
+    try:
+        return max(0.0, float(headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class Response:
+    """Fully read response; the connection is already back in the pool."""
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def text(self):
+        return self.body.decode("utf-8", "replace")
+
+# -------------------------
+# Per-Host State
+# -------------------------
+class Upstream:
+    """Connection pool, circuit breaker and counters for one host."""
+    def __init__(self, host):
+        self.host = host
+        self.session = None
+        self.failures = 0            # consecutive failures
+        self.open_until = 0.0        # circuit rejects calls until this time
+        self.probing = False         # a half-open probe is in flight
+        self.blocked_until = 0.0     # honour Retry-After for every caller, not just the one that got it
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def session_for(self, limit):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=limit, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+            )
+        return self.session
+
+    def allow(self):
+        """Closed: allow. Open: reject until the cooldown ends, then let exactly one probe through."""
+        if self.failures < BREAKER_FAILURES:
+            return True
+        if time.monotonic() < self.open_until or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record(self, ok, latency):
+        self.requests += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.probing = False
+        if ok:
+            self.failures = 0
+            return
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= BREAKER_FAILURES:
+            self.open_until = time.monotonic() + BREAKER_COOLDOWN
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 3) if self.requests else 0.0,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "avg_ms": round(self.latency_total / self.requests * 1000, 1) if self.requests else 0.0,
+            "max_ms": round(self.latency_max * 1000, 1),
+            "circuit": "closed" if self.failures < BREAKER_FAILURES else "open",
+        }
+
+# -------------------------
+# Shared HTTP Client
+# -------------------------
+class HttpClient:
+    """
+    One async HTTP client for every upstream the bot talks to. Each host gets its
+    own keep-alive pool and circuit breaker: after repeated 5xx/429/network
+    failures the host is skipped for a cooldown, so callers fail fast instead of
+    queueing behind a dead API. Idempotent calls are retried with jittered
+    exponential backoff, honouring Retry-After.
+    """
+    def __init__(self, limit_per_host=HTTP_POOL_PER_HOST, retries=HTTP_RETRIES):
+        self.limit_per_host = limit_per_host
+        self.retries = retries
+        self.upstreams = {}  # host -> Upstream
+
+    def upstream(self, url) -> Upstream:
+        host = urlparse(url).netloc.lower()
+        if host not in self.upstreams:
+            self.upstreams[host] = Upstream(host)
+        return self.upstreams[host]
+
+    async def request(self, method, url, *, accept=(), retries=None, timeout=None, **kwargs) -> Response:
+        """
+        Send a request and return the read Response. Statuses in `accept` (e.g. 304,
+        401) are returned like 2xx; any other error status raises
+        aiohttp.ClientResponseError. Raises CircuitOpenError while the host is down.
+        """
+        upstream = self.upstream(url)
+        if retries is None:
+            retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        attempt = 0
+        while True:
+            wait = upstream.blocked_until - time.monotonic()
+            if wait > MAX_RETRY_AFTER or not upstream.allow():
+                upstream.rejected += 1
+                raise CircuitOpenError(f"{upstream.host} is unavailable, not calling it for now")
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            started = time.monotonic()
+            try:
+                async with upstream.session_for(self.limit_per_host).request(method, url, **kwargs) as resp:
+                    body = await resp.read()
+                    status, headers = resp.status, resp.headers
+                    request_info, history, reason = resp.request_info, resp.history, resp.reason
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                upstream.record(False, time.monotonic() - started)
+                if attempt >= retries:
+                    raise
+                delay = backoff_delay(attempt)
+            except BaseException:  # cancelled or a bad request: not the upstream's fault
+                upstream.probing = False
+                raise
+            else:
+                failed = status in RETRY_STATUSES
+                upstream.record(not failed, time.monotonic() - started)
+                if status < 400 or status in accept:
+                    return Response(status, headers, body)
+                retry_after = retry_after_seconds(headers) if failed else None
+                if retry_after:
+                    upstream.blocked_until = max(upstream.blocked_until, time.monotonic() + retry_after)
+                if not failed or attempt >= retries or (retry_after or 0) > MAX_RETRY_AFTER:
+                    raise aiohttp.ClientResponseError(
+                        request_info, history, status=status, message=reason or "", headers=headers
+                    )
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+
+            attempt += 1
+            upstream.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url, **kwargs) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs) -> Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self):
+        return {host: upstream.stats() for host, upstream in self.upstreams.items()}
+
+    async def close(self):
+        for upstream in self.upstreams.values():
+            if upstream.session and not upstream.session.closed:
+                await upstream.session.close()
+
+
+http_client = HttpClient()
@@ -1,50 +1,166 @@
-import aiohttp
 import discord
-from discord.ui import View, Button
+from discord.ui import Button
 import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import ResponseCache
+from http_client import http_client
+from views import ManagedView
 
 LYRICS_API_URL = "https://api.lyrics.ovh/v1/{artist}/{song}"
+LYRICS_TIMEOUT = 8  # seconds per attempt; a dead API trips the circuit breaker instead
+LYRICS_CACHE_PATH = os.getenv("LYRICS_CACHE_PATH", "lyrics_cache.db")
+LYRICS_CACHE_MAX_KB = int(os.getenv("LYRICS_CACHE_MAX_KB", "4096"))  # in-memory LRU budget
+LYRICS_TTL = 24 * 3600           # in memory; the disk copy is kept for LYRICS_DISK_TTL
+LYRICS_DISK_TTL = 30 * 24 * 3600
+NOT_FOUND_TTL = 10 * 60          # misses are remembered briefly, never written to disk
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lyrics (
+    key TEXT PRIMARY KEY,
+    lyrics TEXT NOT NULL,
+    fetched_at INTEGER NOT NULL
+);
+"""
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").casefold().split())
+
+
+def lyrics_key(song_name: str, artist_name: str = None) -> str:
+    """"Adele - Hello" and "adele  -  HELLO" share one cache entry."""
+    return f"{normalize(artist_name)}|{normalize(song_name)}"
+
+
+def split_title(title: str):
+    """"Adele - Hello (Official Video)" -> ("Adele", "Hello"); (None, title) when there's no artist part."""
+    title = re.sub(r"\s*[\(\[][^\)\]]*[\)\]]", "", title or "").strip()
+    if " - " in title:
+        artist, song = title.split(" - ", 1)
+        return artist.strip(), song.strip()
+    return None, title
+
+# -------------------------
+# Lyrics Cache
+# -------------------------
+class LyricsStore:
+    """
+    On-disk lyrics by normalized (artist, song), so popular songs survive restarts.
+    Reads are primary-key lookups; writes go to a worker thread.
+    """
+    def __init__(self, path=LYRICS_CACHE_PATH):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lyrics-cache")
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT lyrics, fetched_at FROM lyrics WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[1] < LYRICS_DISK_TTL:
+            return row[0]
+        return None
+
+    def put(self, key, lyrics):
+        asyncio.get_running_loop().run_in_executor(self.executor, self._write, key, lyrics, int(time.time()))
+
+    def _write(self, key, lyrics, fetched_at):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?)", (key, lyrics, fetched_at))
+            self.db.commit()
+
+
+lyrics_store = LyricsStore()
+lyrics_cache = ResponseCache(max_bytes=LYRICS_CACHE_MAX_KB * 1024)
 
 # -------------------------
 # Fetch Lyrics Function
 # -------------------------
+async def get_lyrics(song_name: str, artist_name: str = None):
+    """
+    Lyrics text, or None when the API has none. Served from memory, then disk,
+    then the API; concurrent requests for one song share a single fetch.
+    Raises aiohttp.ClientError when the API is unreachable (never cached).
+    """
+    key = lyrics_key(song_name, artist_name)
+
+    async def fetch():
+        lyrics = lyrics_store.get(key)
+        if lyrics is not None:
+            return lyrics
+        # if no artist, attempt generic search (API may fail)
+        url = LYRICS_API_URL.format(artist=artist_name or "", song=song_name)
+        resp = await http_client.get(url, timeout=LYRICS_TIMEOUT, accept=(400, 404))
+        lyrics = resp.json().get("lyrics") if resp.status == 200 else None
+        if lyrics:
+            lyrics_store.put(key, lyrics)
+        return lyrics or None
+
+    return await lyrics_cache.get_or_fetch(
+        key, fetch, ttl=lambda lyrics: LYRICS_TTL if lyrics else NOT_FOUND_TTL
+    )
+
+
 async def fetch_lyrics(song_name: str, artist_name: str = None) -> str:
     """
     Fetch lyrics from API. If artist is provided, search specific artist.
     """
-    async with aiohttp.ClientSession() as session:
-        try:
-            if artist_name:
-                url = LYRICS_API_URL.format(artist=artist_name, song=song_name)
-            else:
-                # if no artist, attempt generic search (API may fail)
-                url = LYRICS_API_URL.format(artist="", song=song_name)
-
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    return "❌ Lyrics not found."
-                data = await resp.json()
-                lyrics = data.get("lyrics", "Lyrics not available.")
-                return lyrics
-        except Exception as e:
-            print(f"Error fetching lyrics: {e}")
-            return "❌ Failed to fetch lyrics."
+    try:
+        lyrics = await get_lyrics(song_name, artist_name)
+    except Exception as e:
+        print(f"Error fetching lyrics: {e}")
+        return "❌ Failed to fetch lyrics."
+    return lyrics or "❌ Lyrics not found."
+
+
+async def prefetch_lyrics(song_name: str, artist_name: str = None):
+    """Warm the cache for a song that is about to be asked for; failures are ignored."""
+    try:
+        await get_lyrics(song_name, artist_name)
+    except Exception:
+        pass
 
 # -------------------------
 # Pagination Utilities
 # -------------------------
+class LyricsPages:
+    """
+    Pages of one lyrics string, kept as line-aligned offsets into that string
+    (shared with the lyrics cache) instead of copied slices. Indexable like a list.
+    """
+    __slots__ = ("text", "bounds")
+
+    def __init__(self, text: str, max_chars=1000):
+        self.text = text
+        self.bounds = array("I", [0])  # start of every page, then len(text)
+        pos = 0
+        while pos < len(text):
+            end = text.find("\n", pos)
+            end = len(text) if end == -1 else end + 1
+            if end - self.bounds[-1] > max_chars and pos > self.bounds[-1]:
+                self.bounds.append(pos)
+            pos = end
+        self.bounds.append(len(text))
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.text[self.bounds[index]:self.bounds[index + 1]]
+
+
 def paginate_lyrics(lyrics_text: str, max_chars=1000):
-    pages = []
-    current = ""
-    for line in lyrics_text.split("\n"):
-        if len(current) + len(line) + 1 > max_chars:
-            pages.append(current)
-            current = line
-        else:
-            current += line + "\n"
-    if current:
-        pages.append(current)
-    return pages
+    return LyricsPages(lyrics_text, max_chars)
 
 def create_lyrics_embed(song_name: str, artist_name: str, lyrics_part: str, page_num: int, total_pages: int):
     embed = discord.Embed(
@@ -60,22 +176,23 @@ def create_lyrics_embed(song_name: str, artist_name: str, lyrics_part: str, page
 # -------------------------
 # Lyrics Paginator View
 # -------------------------
-class LyricsPaginator(View):
+class LyricsPaginator(ManagedView):
     def __init__(self, ctx, song_name, artist_name, pages):
-        super().__init__(timeout=None)
-        self.ctx = ctx
+        super().__init__()
+        self.channel = ctx.channel  # only the channel is needed, not the whole command context
         self.song_name = song_name
         self.artist_name = artist_name
         self.pages = pages
         self.current_page = 0
-        self.message = None
 
     async def update_message(self):
+        if self.is_finished():
+            return  # expired while the click was in flight
         embed = create_lyrics_embed(self.song_name, self.artist_name, self.pages[self.current_page], self.current_page + 1, len(self.pages))
         if self.message:
             await self.message.edit(embed=embed, view=self)
         else:
-            self.message = await self.ctx.send(embed=embed, view=self)
+            self.attach(await self.channel.send(embed=embed, view=self))
 
     @discord.ui.button(label="⬅️ Prev", style=discord.ButtonStyle.secondary)
     async def prev_page(self, interaction: discord.Interaction, button: Button):
@@ -1,23 +1,301 @@
 import discord
 from discord.ext import commands
-from discord.ui import View, Button
+from discord.ui import Button
 import asyncio
-import yt_dlp
 import os
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+import time
+from collections import deque
+from itertools import islice
 
-queues = {}      # guild_id -> list of Song
+from resolver import resolver, cache_key, ExtractionError
+from audio_cache import audio_cache
+from track_index import track_index, watch_url
+from spotify import spotify_client
+from music_state import snapshots
+from lyrics import prefetch_lyrics, split_title
+from views import ManagedView
+from guild_config import get_member
+
+queues = {}      # guild_id -> SongQueue
 players = {}     # guild_id -> MusicPlayer per guild
+saved_states = {}  # guild_id -> snapshot not yet restored into a player
+
+IDLE_TIMEOUT = int(os.getenv("MUSIC_IDLE_TIMEOUT", "300"))  # seconds with an empty queue before leaving voice
+PREFETCH_AHEAD = int(os.getenv("MUSIC_PREFETCH_AHEAD", "2"))  # upcoming songs resolved while one plays
+STALE_PLAYBACK_SECONDS = 3  # a cached stream that dies this fast has most likely expired (403)
+DEFAULT_VOLUME = float(os.getenv("MUSIC_DEFAULT_VOLUME", "1.0"))  # 1.0 allows Opus passthrough
+FFMPEG_BEFORE_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_on_network_error 1 -reconnect_delay_max 5"
+SPOTIFY_PAGE_SIZE = 50      # tracks paged in per Spotify request as a playlist/album drains
+NOW_PLAYING_INTERVAL = float(os.getenv("MUSIC_NOW_PLAYING_INTERVAL", "2"))  # min seconds between now-playing edits
+QUEUE_PAGE_SIZE = 10
+RESUME_ON_START = os.getenv("MUSIC_RESUME_ON_START", "0") == "1"  # rejoin voice and resume after a restart
+
+# -------------------------
+# Audio Sources
+# -------------------------
+async def build_source(url, acodec, volume, start=0.0):
+    """
+    At 100% volume an Opus stream is copied straight through (no decode/encode on
+    our CPU). Everything else is decoded to PCM behind a live volume transformer.
+    """
+    before = FFMPEG_BEFORE_OPTIONS if url.startswith("http") else ""
+    if start:
+        before += f" -ss {start:.2f}"
+    if abs(volume - 1.0) < 1e-6:
+        if acodec is None:
+            acodec, _ = await discord.FFmpegOpusAudio.probe(url)
+        if acodec == "opus":
+            return discord.FFmpegOpusAudio(url, codec="copy", before_options=before, options="-vn")
+    return discord.PCMVolumeTransformer(
+        discord.FFmpegPCMAudio(url, before_options=before, options="-vn"),
+        volume=volume
+    )
 
 # -------------------------
 # Song Object
 # -------------------------
 class Song:
-    def __init__(self, title, url, requester):
+    """A queued song. Only IDs are kept so queued songs don't pin discord.py objects."""
+    __slots__ = ("title", "query", "user_id", "channel_id", "guild_id", "spotify_id", "artist")
+
+    def __init__(self, title, query, user_id, channel_id, guild_id, spotify_id=None, artist=None):
         self.title = title
-        self.url = url
-        self.requester = requester
+        self.query = query
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.spotify_id = spotify_id
+        self.artist = artist
+
+    @classmethod
+    def from_spotify(cls, track, user_id, channel_id, guild_id):
+        artist = track['artists'][0]['name']
+        query = f"{track['name']} {artist}"
+        return cls(track['name'], query, user_id, channel_id, guild_id, spotify_id=track.get('id'), artist=artist)
+
+    def lyrics_query(self, resolved_title=None):
+        """(artist, song) for lyrics; plain queries fall back to the "Artist - Song" video title."""
+        if self.artist:
+            return self.artist, self.title
+        return split_title(resolved_title or self.title)
+
+    def to_list(self):
+        return [self.title, self.query, self.user_id, self.channel_id, self.spotify_id, self.artist]
+
+    @classmethod
+    def from_list(cls, data, guild_id):
+        title, query, user_id, channel_id, spotify_id, *rest = data  # snapshots from before `artist` have 5 fields
+        return cls(title, query, user_id, channel_id, guild_id, spotify_id, rest[0] if rest else None)
+
+# -------------------------
+# Lazy Spotify Tracks
+# -------------------------
+class SpotifyTracks:
+    """
+    A Spotify playlist or album that sits in the queue as a single entry and is
+    paged in SPOTIFY_PAGE_SIZE tracks at a time as the queue drains.
+    """
+    __slots__ = ("kind", "spotify_id", "total", "offset", "buffer", "user_id", "channel_id", "guild_id")
+
+    def __init__(self, kind, spotify_id, user_id, channel_id, guild_id):
+        self.kind = kind  # "playlist" or "album"
+        self.spotify_id = spotify_id
+        self.total = None
+        self.offset = 0
+        self.buffer = deque()
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+
+    def __len__(self):
+        remaining = (self.total or 0) - self.offset
+        return len(self.buffer) + max(remaining, 0)
+
+    async def fetch_page(self):
+        path = f"/{self.kind}s/{self.spotify_id}/tracks"
+        try:
+            page = await spotify_client.get(path, limit=SPOTIFY_PAGE_SIZE, offset=self.offset)
+            if self.kind == "playlist":
+                tracks = [item.get("track") for item in page["items"]]
+            else:
+                tracks = page["items"]
+        except Exception as e:
+            print(f"❌ Spotify paging failed for {self.kind} {self.spotify_id}: {e}")
+            self.total = self.offset
+            return
+
+        self.total = page.get("total", 0)
+        self.offset += len(page["items"])
+        if not page["items"]:
+            self.total = self.offset  # the playlist shrank while we were playing it
+        for track in tracks:
+            if track and track.get("name") and track.get("artists"):
+                self.buffer.append(Song.from_spotify(track, self.user_id, self.channel_id, self.guild_id))
+
+    def to_dict(self):
+        """Snapshot form: only the paging cursor and the already buffered songs."""
+        return {
+            "kind": self.kind, "id": self.spotify_id, "total": self.total, "offset": self.offset,
+            "user": self.user_id, "channel": self.channel_id,
+            "buffer": [song.to_list() for song in self.buffer],
+        }
+
+    @classmethod
+    def from_dict(cls, data, guild_id):
+        tracks = cls(data["kind"], data["id"], data["user"], data["channel"], guild_id)
+        tracks.total = data["total"]
+        tracks.offset = data["offset"]
+        tracks.buffer.extend(Song.from_list(s, guild_id) for s in data["buffer"])
+        return tracks
+
+    async def next_song(self):
+        while not self.buffer and self.offset < (self.total or 0):
+            await self.fetch_page()
+        return self.buffer.popleft() if self.buffer else None
+
+# -------------------------
+# Song Queue
+# -------------------------
+class SongQueue:
+    """Deque of Songs and lazy SpotifyTracks entries, kept in request order."""
+    def __init__(self):
+        self.items = deque()
+        self.version = 0  # bumped on every change so views can drop cached pages
+
+    def append(self, item):
+        self.items.append(item)
+        self.version += 1
+
+    def clear(self):
+        self.items.clear()
+        self.version += 1
+
+    def __len__(self):
+        return sum(1 if isinstance(item, Song) else len(item) for item in self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __iter__(self):
+        """Songs that are already known; tracks not yet paged in are skipped."""
+        for item in self.items:
+            if isinstance(item, Song):
+                yield item
+            else:
+                yield from item.buffer
+
+    def lines(self):
+        """One display line per known song, plus one per playlist/album part not paged in yet."""
+        position = 0
+        for item in self.items:
+            songs = (item,) if isinstance(item, Song) else item.buffer
+            for song in songs:
+                position += 1
+                yield f"{position}. {song.title[:90]}"
+            if isinstance(item, SpotifyTracks):
+                remaining = len(item) - len(item.buffer)
+                if remaining > 0:
+                    yield f"… {remaining} more tracks from this Spotify {item.kind}"
+                    position += remaining
+
+    def line_count(self):
+        count = 0
+        for item in self.items:
+            if isinstance(item, Song):
+                count += 1
+            else:
+                count += len(item.buffer) + (1 if len(item) > len(item.buffer) else 0)
+        return count
+
+    def peek(self, n):
+        songs = []
+        for song in self:
+            if len(songs) >= n:
+                break
+            songs.append(song)
+        return songs
+
+    async def get(self):
+        """Pop the next Song, paging in Spotify tracks when needed. None if nothing is left."""
+        while self.items:
+            self.version += 1
+            head = self.items[0]
+            if isinstance(head, Song):
+                return self.items.popleft()
+            song = await head.next_song()
+            if song:
+                return song
+            if self.items and self.items[0] is head:
+                self.items.popleft()
+        return None
+
+# -------------------------
+# Now Playing Updates
+# -------------------------
+class NowPlayingUpdater:
+    """
+    Owns one guild's "Now Playing" message. Updates are coalesced: while an edit
+    is in flight or the last one was under NOW_PLAYING_INTERVAL ago, only the
+    newest state is kept, so fast skipping produces one edit instead of a burst.
+    """
+    def __init__(self, bot, interval=NOW_PLAYING_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self.message = None
+        self.pending = None  # (channel_id, content, view)
+        self.view = None     # the view on the message right now
+        self.last_sent = 0.0
+        self.task = None
+
+    def update(self, channel_id, content, view=None):
+        self.pending = (channel_id, content, view)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.pending:
+            wait = self.last_sent + self.interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            channel_id, content, view = self.pending
+            self.pending = None
+            try:
+                await self._send(channel_id, content, view)
+            except discord.HTTPException as e:
+                print(f"❌ Now playing update failed: {e}")
+            self.last_sent = time.monotonic()
+
+    async def _send(self, channel_id, content, view):
+        if self.message and self.message.channel.id == channel_id:
+            try:
+                self.message = await self.message.edit(content=content, view=view)
+                self._show(view)
+                return
+            except discord.NotFound:
+                self.message = None
+        channel = self.bot.get_channel(channel_id)
+        if channel:
+            if self.view:
+                asyncio.create_task(self.view.expire())  # the old message keeps greyed-out buttons
+                self.view = None
+            self.message = await channel.send(content, view=view)
+            self._show(view)
+
+    def _show(self, view):
+        """Track the view now on the message; the one it replaced stops listening."""
+        if self.view and self.view is not view:
+            self.view.retire()
+        self.view = view
+        if view:
+            view.attach(self.message)
+
+    def cancel(self):
+        self.pending = None
+        if self.task:
+            self.task.cancel()
+        if self.view:
+            asyncio.create_task(self.view.expire())
+            self.view = None
 
 # -------------------------
 # Music Player
@@ -26,153 +304,432 @@ class MusicPlayer:
     def __init__(self, bot, guild):
         self.bot = bot
         self.guild = guild
-        self.queue = queues.setdefault(guild.id, [])
+        self.queue = queues.setdefault(guild.id, SongQueue())
         self.current = None
         self.voice = None
         self.play_next_event = asyncio.Event()
+        self.queue_event = asyncio.Event()  # set whenever a song is enqueued
         self.loop_task = bot.loop.create_task(self.player_loop())
-        self.volume = 0.5
+        self.volume = DEFAULT_VOLUME
         self.is_paused = False
-        self.now_playing_msg = None
+        self.stream_url = None
+        self.started_at = 0.0
+        self.paused_at = None
+        self.paused_total = 0.0
+        self.now_playing = NowPlayingUpdater(bot)
+        self.resolve_task = None
+        self.prefetch_tasks = set()
+        self.skipped = False
+        self.resume_at = 0.0          # seek offset for the first song after a restore
+        self.resume_channel_id = None  # voice channel to rejoin after a restore
+        self.lyrics_query = None       # (artist, song) of the current track, for a bare !lyrics
+
+    async def resolve(self, query, fresh=False):
+        """Resolve off the event loop. Returns None if the song was skipped meanwhile."""
+        task = self.resolve_task = asyncio.create_task(resolver.resolve(self.guild.id, query, fresh=fresh))
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self.resolve_task = None
+        if task.cancelled():
+            return None
+        return task.result()
+
+    def enqueue(self, item):
+        self.queue.append(item)
+        self.queue_event.set()
+        snapshots.mark(self.guild.id)
+
+    def snapshot(self):
+        """Compact, JSON-friendly state for crash recovery."""
+        voice_channel = self.voice.channel if self.voice and self.voice.is_connected() else None
+        return {
+            "voice_channel_id": voice_channel.id if voice_channel else None,
+            "volume": self.volume,
+            "position": round(self.position(), 1) if self.current else 0.0,
+            "current": self.current.to_list() if self.current else None,
+            "queue": [
+                {"song": item.to_list()} if isinstance(item, Song) else {"tracks": item.to_dict()}
+                for item in self.queue.items
+            ],
+        }
+
+    def restore(self, state, resume=False):
+        """Load a saved snapshot; the interrupted song goes back to the front of the queue."""
+        self.volume = state.get("volume", self.volume)
+        if state.get("current"):
+            self.queue.append(Song.from_list(state["current"], self.guild.id))
+            if resume:
+                self.resume_at = state.get("position", 0.0)
+        for item in state.get("queue", []):
+            if "song" in item:
+                self.queue.append(Song.from_list(item["song"], self.guild.id))
+            else:
+                self.queue.append(SpotifyTracks.from_dict(item["tracks"], self.guild.id))
+        if resume:
+            self.resume_channel_id = state.get("voice_channel_id")
+        if self.queue:
+            self.queue_event.set()
+
+    async def wait_for_songs(self):
+        """Sleep until something is enqueued. Returns False once the idle timeout passes."""
+        while not self.queue:
+            self.queue_event.clear()
+            try:
+                await asyncio.wait_for(self.queue_event.wait(), timeout=IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return bool(self.queue)
+        return True
+
+    async def teardown(self):
+        """Leave voice and drop this guild's state so idle guilds cost nothing."""
+        if players.get(self.guild.id) is self:
+            del players[self.guild.id]
+            queues.pop(self.guild.id, None)
+            snapshots.drop(self.guild.id)
+        resolver.forget(self.guild.id)
+        self.queue.clear()
+        self.cancel_prefetch()
+        self.now_playing.cancel()
+        if self.resolve_task:
+            self.resolve_task.cancel()
+        if self.voice and self.voice.is_connected():
+            await self.voice.disconnect()
+        if self.loop_task is not asyncio.current_task():
+            self.loop_task.cancel()
+
+    def prefetch(self):
+        """Resolve the next few queued songs in the background so track changes are gapless."""
+        for song in self.queue.peek(PREFETCH_AHEAD):
+            video_id, target = self.target(song)
+            if video_id in audio_cache or resolver.is_cached(target):
+                continue
+            task = asyncio.create_task(self._prefetch(song, target))
+            self.prefetch_tasks.add(task)
+            task.add_done_callback(self.prefetch_tasks.discard)
+
+    def prefetch_lyrics(self, resolved_title=None):
+        """Warm the lyrics cache for the current and next track, so !lyrics answers instantly."""
+        upcoming = [(self.current, resolved_title)] + [(song, None) for song in self.queue.peek(1)]
+        for i, (song, title) in enumerate(upcoming):
+            artist, name = song.lyrics_query(title)
+            if i == 0:
+                self.lyrics_query = (artist, name)
+            if artist and name:
+                task = asyncio.create_task(prefetch_lyrics(name, artist))
+                self.prefetch_tasks.add(task)
+                task.add_done_callback(self.prefetch_tasks.discard)
+
+    async def _prefetch(self, song, target):
+        info = await resolver.prefetch(self.guild.id, target)
+        if info:
+            track_index.store(song.query, info.get("id"), song.spotify_id)
+
+    def target(self, song):
+        """(video_id, what to hand yt-dlp). Indexed songs skip the YouTube search."""
+        video_id = track_index.lookup(song.query, song.spotify_id)
+        return video_id, watch_url(video_id) if video_id else song.query
+
+    def cancel_prefetch(self):
+        for task in list(self.prefetch_tasks):
+            task.cancel()
+
+    def skip(self):
+        """Skip the current song, including one that is still being resolved."""
+        self.skipped = True
+        if self.resolve_task and not self.resolve_task.done():
+            self.resolve_task.cancel()
+            return True
+        if self.voice and self.voice.is_playing():
+            self.voice.stop()
+            return True
+        return False
+
+    def position(self):
+        """Seconds into the current track, excluding time spent paused."""
+        if not self.started_at:
+            return 0.0
+        now = self.paused_at or time.monotonic()
+        return max(now - self.started_at - self.paused_total, 0.0)
+
+    def pause(self):
+        if self.voice and self.voice.is_playing():
+            self.voice.pause()
+            self.is_paused = True
+            self.paused_at = time.monotonic()
+            return True
+        return False
+
+    def resume(self):
+        if self.voice and self.is_paused:
+            self.voice.resume()
+            self.is_paused = False
+            if self.paused_at:
+                self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+            return True
+        return False
+
+    async def set_volume(self, volume):
+        """Apply a volume change to the track that is playing right now."""
+        self.volume = volume
+        snapshots.mark(self.guild.id)
+        source = self.voice.source if self.voice else None
+        if source is None:
+            return
+        if isinstance(source, discord.PCMVolumeTransformer):
+            source.volume = volume
+            return
+        if not self.stream_url:
+            return
+        # Opus passthrough can't be scaled, so continue from the same spot through a PCM source
+        new_source = await build_source(self.stream_url, "pcm", volume, start=self.position())
+        if not self.voice.encoder:
+            self.voice.encoder = discord.opus.Encoder()  # play() only creates one for PCM sources
+        self.voice.source = new_source
+        source.cleanup()
+        if self.is_paused:
+            self.voice.pause()  # swapping the source resumes the player
+
+    async def notify(self, song, content, **kwargs):
+        """Send a message to the channel the song was requested from."""
+        channel = self.bot.get_channel(song.channel_id)
+        if channel:
+            return await channel.send(content, **kwargs)
 
     async def player_loop(self):
         while True:
-            if not self.queue:
-                await asyncio.sleep(1)
-                continue
+            self.current = None
+            self.lyrics_query = None
+            if not await self.wait_for_songs():
+                await self.teardown()
+                return
 
-            self.current = self.queue.pop(0)
-            channel = getattr(self.current.requester.author.voice, "channel", None)
+            self.current = await self.queue.get()
+            snapshots.mark(self.guild.id)
+            if not self.current:
+                continue
+            member = await get_member(self.guild, self.current.user_id)  # Member.voice reads the guild's voice states
+            channel = getattr(getattr(member, "voice", None), "channel", None)
+            if not channel and self.resume_channel_id:
+                channel = self.guild.get_channel(self.resume_channel_id)
+            self.resume_channel_id = None
             if not channel:
-                await self.current.requester.send(f"❌ You are not in a voice channel!")
+                await self.notify(self.current, f"❌ <@{self.current.user_id}> you are not in a voice channel!")
                 continue
 
             # Connect if not connected
             if not self.voice or not self.voice.is_connected():
                 self.voice = await channel.connect()
 
-            # YDL options
-            ydl_opts = {
-                "format": "bestaudio/best",
-                "quiet": True,
-                "cookiefile": "cookies.txt" if os.path.exists("cookies.txt") else None
-            }
-
-            # Attempt to play song, refresh URL on 403
-            for attempt in range(3):
+            # Play from the stream cache; a stale entry (403) is evicted and resolved once more
+            self.skipped = False
+            song = self.current
+            video_id, target = self.target(song)
+            indexed = video_id is not None and not cache_key(song.query).startswith("yt:")
+            local = audio_cache.lookup(video_id) if video_id else None
+            resolved_title = None
+            for attempt in range(2):
                 try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(self.current.url, download=False)
-                        url2 = info['url']
-
-                    source = discord.FFmpegPCMAudio(url2, options=f"-vn -filter:a volume={self.volume}")
-                    self.voice.play(source, after=lambda e: self.play_next_event.set())
-
-                    # Send/Update Now Playing message with buttons
-                    view = MusicControlView(self)
-                    if self.now_playing_msg:
-                        try:
-                            await self.now_playing_msg.edit(content=f"▶️ Now Playing: **{self.current.title}**", view=view)
-                        except:
-                            self.now_playing_msg = await self.current.requester.send(f"▶️ Now Playing: **{self.current.title}**", view=view)
+                    if local and attempt == 0:
+                        # Popular track already on disk: no extraction, no network round trip
+                        from_cache = True
+                        self.stream_url, acodec = local
                     else:
-                        self.now_playing_msg = await self.current.requester.send(f"▶️ Now Playing: **{self.current.title}**", view=view)
+                        from_cache = attempt == 0 and resolver.is_cached(target)
+                        info = await self.resolve(target, fresh=attempt > 0)
+                        if info is None:
+                            break  # skipped while resolving
+                        self.stream_url, acodec = info['url'], info.get("acodec")
+                        resolved_title = info.get("title")
+                        track_index.store(song.query, info.get("id"), song.spotify_id)
+                        audio_cache.record_play(info.get("id"))
+
+                    start, self.resume_at = self.resume_at, 0.0
+                    source = await build_source(self.stream_url, acodec, self.volume, start=start)
+                    started = time.monotonic()
+                    self.started_at = started - start
+                    self.paused_at = None
+                    self.paused_total = 0.0
+                    self.voice.play(source, after=lambda e: self.bot.loop.call_soon_threadsafe(self.play_next_event.set))
+
+                    # Send/Update Now Playing message with buttons (coalesced and rate limited)
+                    self.now_playing.update(
+                        self.current.channel_id, f"▶️ Now Playing: **{self.current.title}**", MusicControlView(self)
+                    )
 
                     self.is_paused = False
+                    self.prefetch()
+                    self.prefetch_lyrics(resolved_title)
                     await self.play_next_event.wait()
                     self.play_next_event.clear()
+                    if from_cache and not self.skipped and time.monotonic() - started < STALE_PLAYBACK_SECONDS:
+                        resolver.invalidate(target)
+                        continue
                     break
 
-                except yt_dlp.utils.DownloadError as e:
-                    if "403" in str(e):
-                        await self.current.requester.send(f"⚠️ URL expired, refreshing and retrying {self.current.title}...")
+                except asyncio.TimeoutError:
+                    await self.notify(self.current, f"⌛ Timed out looking up {self.current.title}, skipping.")
+                    break
+                except ExtractionError as e:
+                    if "403" in str(e) and attempt == 0:
+                        resolver.invalidate(target)
+                        await self.notify(self.current, f"⚠️ URL expired, refreshing and retrying {self.current.title}...")
+                        continue
+                    elif indexed and attempt == 0:
+                        # The indexed video went away; search for the song again
+                        track_index.forget(song.query, song.spotify_id)
+                        target = song.query
                         continue
                     else:
-                        await self.current.requester.send(f"❌ Could not play {self.current.title}: {e}")
+                        await self.notify(self.current, f"❌ Could not play {self.current.title}: {e}")
                         break
                 except Exception as e:
-                    await self.current.requester.send(f"❌ Could not play {self.current.title}: {e}")
+                    await self.notify(self.current, f"❌ Could not play {self.current.title}: {e}")
                     break
 
 # -------------------------
 # Music Controls
 # -------------------------
-class MusicControlView(View):
+class MusicControlView(ManagedView):
     def __init__(self, player):
-        super().__init__(timeout=None)
+        super().__init__()
         self.player = player
 
     @discord.ui.button(label="⏭ Skip", style=discord.ButtonStyle.primary)
     async def skip(self, interaction: discord.Interaction, button: Button):
-        if self.player.voice and self.player.voice.is_playing():
-            self.player.voice.stop()
+        if self.player.skip():
             await interaction.response.send_message("⏭ Skipped!", ephemeral=True)
 
     @discord.ui.button(label="⏹ Stop", style=discord.ButtonStyle.danger)
-    async def stop(self, interaction: discord.Interaction, button: Button):
+    async def stop_button(self, interaction: discord.Interaction, button: Button):
         if self.player.voice:
-            await self.player.voice.disconnect()
-            self.player.queue.clear()
+            await self.player.teardown()
             await interaction.response.send_message("⏹ Stopped and cleared queue!", ephemeral=True)
 
     @discord.ui.button(label="⏸ Pause", style=discord.ButtonStyle.secondary)
     async def pause(self, interaction: discord.Interaction, button: Button):
-        if self.player.voice and self.player.voice.is_playing():
-            self.player.voice.pause()
-            self.player.is_paused = True
+        if self.player.pause():
             await interaction.response.send_message("⏸ Paused!", ephemeral=True)
 
     @discord.ui.button(label="▶ Resume", style=discord.ButtonStyle.success)
     async def resume(self, interaction: discord.Interaction, button: Button):
-        if self.player.voice and self.player.is_paused:
-            self.player.voice.resume()
-            self.player.is_paused = False
+        if self.player.resume():
             await interaction.response.send_message("▶ Resumed!", ephemeral=True)
 
     @discord.ui.button(label="🔊 Volume +", style=discord.ButtonStyle.primary)
     async def vol_up(self, interaction: discord.Interaction, button: Button):
-        self.player.volume = min(self.player.volume + 0.1, 2.0)
+        await self.player.set_volume(min(round(self.player.volume + 0.1, 2), 2.0))
         await interaction.response.send_message(f"🔊 Volume: {int(self.player.volume*100)}%", ephemeral=True)
 
     @discord.ui.button(label="🔉 Volume -", style=discord.ButtonStyle.primary)
     async def vol_down(self, interaction: discord.Interaction, button: Button):
-        self.player.volume = max(self.player.volume - 0.1, 0.0)
+        await self.player.set_volume(max(round(self.player.volume - 0.1, 2), 0.0))
         await interaction.response.send_message(f"🔉 Volume: {int(self.player.volume*100)}%", ephemeral=True)
 
+# -------------------------
+# Queue View
+# -------------------------
+class QueuePaginator(ManagedView):
+    """Paginated !qlist. Only the visible page is rendered; pages are cached until the queue changes."""
+    def __init__(self, queue):
+        super().__init__(timeout=300)
+        self.queue = queue
+        self.page = 0
+        self.pages = {}       # page number -> rendered text
+        self.page_total = 1
+        self.version = None
+
+    def render(self):
+        if self.version != self.queue.version:
+            self.version = self.queue.version
+            self.pages.clear()
+            self.page_total = max(1, -(-self.queue.line_count() // QUEUE_PAGE_SIZE))
+        self.page = min(self.page, self.page_total - 1)
+        text = self.pages.get(self.page)
+        if text is None:
+            start = self.page * QUEUE_PAGE_SIZE
+            text = self.pages[self.page] = "\n".join(islice(self.queue.lines(), start, start + QUEUE_PAGE_SIZE))
+        embed = discord.Embed(title="🎶 Queue", description=text or "No songs in the queue.")
+        embed.set_footer(text=f"Page {self.page + 1}/{self.page_total} • {len(self.queue)} songs")
+        return embed
+
+    @discord.ui.button(label="⬅️ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: Button):
+        self.page = max(self.page - 1, 0)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next ➡️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
 # -------------------------
 # Bot Setup
 # -------------------------
+def get_player(bot, guild, resume=False):
+    """Return the guild's player, creating it (and restoring any saved state) on first use."""
+    player = players.get(guild.id)
+    if not player:
+        player = players[guild.id] = MusicPlayer(bot, guild)
+        state = saved_states.pop(guild.id, None)
+        if state:
+            player.restore(state, resume=resume)
+    return player
+
+
+async def resume_saved_players(bot):
+    """After a restart, rejoin voice and continue every guild that was playing."""
+    await bot.wait_until_ready()
+    for guild_id, state in list(saved_states.items()):
+        guild = bot.get_guild(guild_id)
+        if guild and state.get("current") and state.get("voice_channel_id"):
+            get_player(bot, guild, resume=True)
+
+
 async def setup(bot):
+    # Saved queues are restored lazily: on the guild's next !play, or right away with MUSIC_RESUME_ON_START=1
+    saved_states.update(snapshots.load_all())
+    snapshots.start(players)
+    if RESUME_ON_START and saved_states:
+        asyncio.create_task(resume_saved_players(bot))
+
     @bot.command()
     async def play(ctx, *, query):
         """Play a song from YouTube or Spotify"""
         guild_id = ctx.guild.id
-        player = players.get(guild_id)
-        if not player:
-            player = MusicPlayer(bot, ctx.guild)
-            players[guild_id] = player
+        player = get_player(bot, ctx.guild)
 
         # Spotify handling
         if "spotify.com" in query:
-            sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-                client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-                client_secret=os.getenv("SPOTIFY_CLIENT_SECRET")
-            ))
+            spotify_id = query.split("/")[-1].split("?")[0]
             if "track" in query:
-                track_id = query.split("/")[-1].split("?")[0]
-                track = sp.track(track_id)
-                query = f"{track['name']} {track['artists'][0]['name']}"
-            elif "playlist" in query:
-                playlist_id = query.split("/")[-1].split("?")[0]
-                playlist = sp.playlist_items(playlist_id)
-                for item in playlist['items']:
-                    track = item['track']
-                    youtube_query = f"{track['name']} {track['artists'][0]['name']}"
-                    player.queue.append(Song(track['name'], youtube_query, ctx))
-                await ctx.send(f"✅ Added **{len(playlist['items'])} tracks** to the queue.")
+                try:
+                    track = await spotify_client.get(f"/tracks/{spotify_id}")
+                except Exception as e:
+                    await ctx.send(f"❌ Could not load that track: {e}")
+                    return
+                player.enqueue(Song.from_spotify(track, ctx.author.id, ctx.channel.id, guild_id))
+                player.prefetch()
+                await ctx.send(f"✅ Added **{track['name']}** to the queue.")
+                return
+            elif "playlist" in query or "album" in query:
+                kind = "playlist" if "playlist" in query else "album"
+                tracks = SpotifyTracks(kind, spotify_id, ctx.author.id, ctx.channel.id, guild_id)
+                await tracks.fetch_page()
+                if not len(tracks):
+                    await ctx.send(f"❌ Could not load that {kind}.")
+                    return
+                player.enqueue(tracks)
+                player.prefetch()
+                await ctx.send(f"✅ Added **{len(tracks)} tracks** to the queue.")
                 return
 
-        player.queue.append(Song(query, query, ctx))
+        player.enqueue(Song(query, query, ctx.author.id, ctx.channel.id, guild_id))
+        player.prefetch()
         await ctx.send(f"✅ Added **{query}** to the queue.")
 
     @bot.command()
@@ -183,8 +740,8 @@ async def setup(bot):
         if not player or not player.queue:
             await ctx.send("No songs in the queue.")
             return
-        embed = discord.Embed(title="🎶 Queue", description="\n".join([f"{i+1}. {song.title}" for i, song in enumerate(player.queue)]))
-        await ctx.send(embed=embed)
+        view = QueuePaginator(player.queue)
+        view.attach(await ctx.send(embed=view.render(), view=view))
 
     @bot.command()
     async def reset(ctx):
@@ -194,7 +751,5 @@ async def setup(bot):
         if not player:
             await ctx.send("No music player running.")
             return
-        if player.voice:
-            await player.voice.disconnect()
-        player.queue.clear()
+        await player.teardown()
         await ctx.send("✅ Music queue cleared and player stopped.")
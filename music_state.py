@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------
+# Snapshot Config
+# -------------------------
+MUSIC_STATE_PATH = os.getenv("MUSIC_STATE_PATH", "music_state.db")
+SNAPSHOT_INTERVAL = int(os.getenv("MUSIC_SNAPSHOT_INTERVAL", "15"))  # seconds between batched writes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    guild_id INTEGER PRIMARY KEY,
+    snapshot TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+"""
+
+# -------------------------
+# Snapshot Store
+# -------------------------
+class SnapshotStore:
+    """
+    Crash-safe store for per-guild player state. Only guilds that changed (or are
+    playing, so the position moves) are written, in one batch per interval, on a
+    worker thread. SQLite commits are atomic, so a crash never leaves half a row.
+    """
+    def __init__(self, path=MUSIC_STATE_PATH, interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="music-state")
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.dirty = set()    # guild IDs whose snapshot must be rewritten
+        self.dropped = set()  # guild IDs whose snapshot must be deleted
+        self.task = None
+
+    def load_all(self) -> dict:
+        """guild_id -> snapshot dict. Called once at startup."""
+        rows = self.db.execute("SELECT guild_id, snapshot FROM players").fetchall()
+        saved = {}
+        for guild_id, blob in rows:
+            try:
+                saved[guild_id] = json.loads(blob)
+            except ValueError:
+                pass
+        return saved
+
+    def mark(self, guild_id):
+        self.dropped.discard(guild_id)
+        self.dirty.add(guild_id)
+
+    def drop(self, guild_id):
+        self.dirty.discard(guild_id)
+        self.dropped.add(guild_id)
+
+    def start(self, players: dict):
+        """Begin periodic flushing of the given guild_id -> MusicPlayer mapping."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run(players))
+
+    async def _run(self, players):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush(players)
+            except Exception as e:
+                print(f"❌ Music snapshot failed: {e}")
+
+    async def flush(self, players):
+        guild_ids = self.dirty | {gid for gid, p in players.items() if p.current}
+        self.dirty = set()
+        dropped, self.dropped = self.dropped, set()
+        if not guild_ids and not dropped:
+            return
+        now = int(time.time())
+        rows = [
+            (gid, json.dumps(players[gid].snapshot(), separators=(",", ":")), now)
+            for gid in guild_ids if gid in players
+        ]
+        dropped |= {gid for gid in guild_ids if gid not in players}
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._write, rows, [(gid,) for gid in dropped])
+
+    def _write(self, rows, dropped):
+        self.db.executemany("INSERT OR REPLACE INTO players VALUES (?, ?, ?)", rows)
+        self.db.executemany("DELETE FROM players WHERE guild_id = ?", dropped)
+        self.db.commit()
+
+
+snapshots = SnapshotStore()
@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+# -------------------------
+# Pacer
+# -------------------------
+class Pacer:
+    """
+    Hands out time slots `spacing` seconds apart, so a burst of callers turns
+    into a steady stream of API calls. Slots are tracked per key (e.g. a guild
+    ID), so a burst under one key doesn't delay callers under another.
+    """
+    def __init__(self, spacing):
+        self.spacing = spacing
+        self.next_slots = {}  # key -> monotonic time of the next free slot
+
+    async def wait(self, key=None):
+        """Wait for the next slot under `key`."""
+        if self.spacing <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next_slots.get(key, 0.0))
+        self.next_slots[key] = slot + self.spacing
+        if slot > now:
+            await asyncio.sleep(slot - now)
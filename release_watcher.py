@@ -0,0 +1,182 @@
+import asyncio
+import heapq
+import json
+import os
+import random
+import time
+from datetime import date
+
+import aiohttp
+
+from spotify import spotify_client, SPOTIFY_ARTIST_ID
+from cursors import cursors, newer_than
+
+# -------------------------
+# Watcher Config
+# -------------------------
+FOLLOWED_ARTISTS_PATH = os.getenv("FOLLOWED_ARTISTS_PATH", "followed_artists.json")
+RELEASE_POLL_INTERVAL = int(os.getenv("RELEASE_POLL_INTERVAL", "600"))        # seconds between polls per artist
+RELEASE_REQUESTS_PER_MINUTE = int(os.getenv("RELEASE_REQUESTS_PER_MINUTE", "30"))  # global budget
+HOT_POLL_FACTOR = 4       # artists with a recent release are polled this many times more often
+HOT_DAYS = 14             # "recent" for the above
+METADATA_REFRESH = 6 * 3600
+ARTIST_BATCH_SIZE = 50    # /v1/artists?ids= limit
+CATCH_UP_PAGE = 20        # releases read per poll, so several releases in one window are all announced
+
+
+def load_followed_artists(path=FOLLOWED_ARTISTS_PATH):
+    """
+    Followed artist IDs from a JSON list of IDs or {"id": ...} objects.
+    Falls back to the default artist when the file is missing or empty.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = []
+    ids = []
+    for entry in data if isinstance(data, list) else []:
+        artist_id = entry.get("id") if isinstance(entry, dict) else entry
+        if isinstance(artist_id, str) and artist_id not in ids:
+            ids.append(artist_id)
+    return ids or [SPOTIFY_ARTIST_ID]
+
+
+def is_recent(release_date: str, days=HOT_DAYS) -> bool:
+    """Spotify dates come as YYYY, YYYY-MM or YYYY-MM-DD."""
+    parts = (release_date or "").split("-")
+    try:
+        released = date(int(parts[0]), int(parts[1]) if len(parts) > 1 else 1, int(parts[2]) if len(parts) > 2 else 1)
+    except (ValueError, IndexError):
+        return False
+    return (date.today() - released).days <= days
+
+
+def sortable_date(release_date: str) -> str:
+    """Pad YYYY / YYYY-MM to YYYY-MM-DD so release dates compare as strings."""
+    parts = (release_date or "0000").split("-")
+    return "-".join(parts + ["01"] * (3 - len(parts)))
+
+# -------------------------
+# Request Budget
+# -------------------------
+class RequestBudget:
+    """Token bucket shared by every poll, so following more artists never bursts."""
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# -------------------------
+# Release Watcher
+# -------------------------
+class ReleaseWatcher:
+    """
+    Polls every followed artist's newest release once per interval. Polls are
+    spread over the interval with jitter and share one request budget; artists
+    with a recent release are polled more often. Artist metadata is fetched in
+    batches of 50. `on_release(artist, album)` is awaited for every new release;
+    what has been announced is tracked in the persistent cursor store.
+    """
+    def __init__(self, on_release, interval=RELEASE_POLL_INTERVAL, per_minute=RELEASE_REQUESTS_PER_MINUTE):
+        self.on_release = on_release
+        self.interval = interval
+        self.budget = RequestBudget(per_minute)
+        self.artists = {}    # artist_id -> metadata from /v1/artists
+        self.hot = set()
+        self.schedule = []   # heap of (due, artist_id)
+        self.metadata_at = None
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def _next_due(self, artist_id):
+        interval = self.interval / HOT_POLL_FACTOR if artist_id in self.hot else self.interval
+        return time.monotonic() + interval * random.uniform(0.9, 1.1)
+
+    async def _refresh_artists(self):
+        """Reload the followed list and fetch metadata in batches; new artists get a random slot."""
+        ids = load_followed_artists()
+        now = time.monotonic()
+        scheduled = {artist_id for _, artist_id in self.schedule}
+        for artist_id in ids:
+            if artist_id not in scheduled:
+                heapq.heappush(self.schedule, (now + random.uniform(0, self.interval), artist_id))
+        followed = set(ids)
+        self.schedule = [(due, a) for due, a in self.schedule if a in followed]
+        heapq.heapify(self.schedule)
+
+        for i in range(0, len(ids), ARTIST_BATCH_SIZE):
+            batch = ids[i:i + ARTIST_BATCH_SIZE]
+            await self.budget.acquire()
+            try:
+                data = await spotify_client.get("/artists", ids=",".join(batch))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"❌ Spotify artist metadata failed: {e}")
+                continue
+            for artist in data.get("artists", []):
+                if artist:
+                    self.artists[artist["id"]] = artist
+        self.metadata_at = now
+
+    async def _run(self):
+        while True:
+            try:
+                if self.metadata_at is None or time.monotonic() - self.metadata_at > METADATA_REFRESH:
+                    await self._refresh_artists()
+                if not self.schedule:
+                    await asyncio.sleep(self.interval)
+                    continue
+                due, artist_id = self.schedule[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(min(wait, METADATA_REFRESH))
+                    continue
+                heapq.heappop(self.schedule)
+                await self.budget.acquire()
+                await self.check(artist_id)
+                heapq.heappush(self.schedule, (self._next_due(artist_id), artist_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Release watcher error: {e}")
+                await asyncio.sleep(5)
+
+    async def check(self, artist_id):
+        """Announce, oldest first, every release newer than the artist's saved cursor."""
+        try:
+            data = await spotify_client.get(
+                f"/artists/{artist_id}/albums", include_groups="single,album", limit=CATCH_UP_PAGE
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"❌ Spotify release check failed for {artist_id}: {e}")
+            return
+        items = data.get("items") or []
+        if not items:
+            return
+        if any(is_recent(album.get("release_date")) for album in items):
+            self.hot.add(artist_id)
+        else:
+            self.hot.discard(artist_id)
+
+        key = f"spotify:{artist_id}"
+        new, cursor = newer_than(items, cursors.get(key), lambda a: a["id"], lambda a: sortable_date(a.get("release_date")))
+        for album in new:
+            try:
+                await self.on_release(self.artists.get(artist_id, {"id": artist_id}), album)
+            except Exception as e:
+                print(f"❌ Release announcement failed for {album.get('id')}: {e}")
+        cursors.set(key, cursor)
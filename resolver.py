@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+from cache import TTLCache
+
+# -------------------------
+# Resolver Config
+# -------------------------
+RESOLVER_WORKERS = int(os.getenv("RESOLVER_WORKERS", "4"))          # threads shared by all guilds
+RESOLVER_GUILD_LIMIT = int(os.getenv("RESOLVER_GUILD_LIMIT", "2"))  # concurrent lookups per guild
+RESOLVER_TIMEOUT = float(os.getenv("RESOLVER_TIMEOUT", "20"))       # seconds per lookup
+STREAM_CACHE_SIZE = int(os.getenv("STREAM_CACHE_SIZE", "2048"))
+STREAM_CACHE_TTL = int(os.getenv("STREAM_CACHE_TTL", "3600"))       # used when the URL has no expire=
+STREAM_EXPIRY_MARGIN = 600  # drop googlevideo URLs 10 minutes before they actually expire
+
+
+def ydl_options():
+    return {
+        "format": "bestaudio/best",
+        "quiet": True,
+        "noplaylist": True,
+        "default_search": "ytsearch",
+        "socket_timeout": 10,
+        "cookiefile": "cookies.txt" if os.path.exists("cookies.txt") else None
+    }
+
+
+class ExtractionError(Exception):
+    """yt-dlp could not resolve a query (wraps DownloadError, so callers needn't import yt_dlp)."""
+
+
+def extract_info(query: str) -> dict:
+    """Blocking yt-dlp lookup. Only ever called from the resolver pool."""
+    import yt_dlp  # ~0.2 s to import, so it is loaded on the first lookup rather than at startup
+    try:
+        with yt_dlp.YoutubeDL(ydl_options()) as ydl:
+            info = ydl.extract_info(query, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        raise ExtractionError(str(e)) from e
+    if info and "entries" in info:
+        entries = [e for e in info["entries"] if e]
+        if not entries:
+            raise ExtractionError(f"No results for {query}")
+        info = entries[0]
+    return info
+
+
+def slim_info(info: dict) -> dict:
+    """Keep only what playback needs; full yt-dlp info dicts are ~100 KB each."""
+    return {
+        "id": info.get("id"),
+        "url": info.get("url"),
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "acodec": info.get("acodec"),
+    }
+
+
+def cache_key(query: str) -> str:
+    """YouTube links are keyed by video ID, everything else by normalized text."""
+    parsed = urlparse(query.strip())
+    host = parsed.netloc.lower()
+    if host.endswith("youtube.com") and parse_qs(parsed.query).get("v"):
+        return "yt:" + parse_qs(parsed.query)["v"][0]
+    if host == "youtu.be" and parsed.path.strip("/"):
+        return "yt:" + parsed.path.strip("/")
+    return " ".join(query.lower().split())
+
+
+def stream_ttl(url: str) -> float:
+    """Seconds a resolved stream URL stays usable, based on googlevideo's expire= param."""
+    expire = parse_qs(urlparse(url or "").query).get("expire")
+    if not expire:
+        return STREAM_CACHE_TTL
+    try:
+        return min(int(expire[0]) - time.time() - STREAM_EXPIRY_MARGIN, STREAM_CACHE_TTL * 6)
+    except ValueError:
+        return STREAM_CACHE_TTL
+
+# -------------------------
+# Stream Resolver
+# -------------------------
+class StreamResolver:
+    """
+    Runs yt-dlp extraction in a bounded thread pool so a slow lookup never blocks
+    the event loop. Each guild gets its own semaphore, so one busy guild can't
+    hog every worker. Results are cached across guilds until the stream URL
+    expires, and concurrent lookups of the same song share one extraction.
+    """
+    def __init__(self, max_workers=RESOLVER_WORKERS, per_guild=RESOLVER_GUILD_LIMIT, timeout=RESOLVER_TIMEOUT):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resolver")
+        self.per_guild = per_guild
+        self.timeout = timeout
+        self.semaphores = {}  # guild_id -> asyncio.Semaphore
+        self.cache = TTLCache(maxsize=STREAM_CACHE_SIZE, ttl=STREAM_CACHE_TTL)
+        self.inflight = {}    # cache key -> [task, waiter count]
+
+    def _semaphore(self, guild_id):
+        sem = self.semaphores.get(guild_id)
+        if sem is None:
+            sem = self.semaphores[guild_id] = asyncio.Semaphore(self.per_guild)
+        return sem
+
+    async def _lookup(self, guild_id, query: str) -> dict:
+        async with self._semaphore(guild_id):
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, extract_info, query)
+            info = slim_info(await asyncio.wait_for(future, timeout=self.timeout))
+        ttl = stream_ttl(info["url"])
+        self.cache.set(cache_key(query), info, ttl=ttl)
+        if info["id"]:
+            self.cache.set("yt:" + info["id"], info, ttl=ttl)
+        return info
+
+    async def resolve(self, guild_id, query: str, fresh=False) -> dict:
+        """
+        Resolve a query or URL to a slim info dict. Raises asyncio.TimeoutError after
+        `timeout` seconds. When every waiter has been cancelled (e.g. the song was
+        skipped) the lookup is cancelled too and the guild slot is freed; the worker
+        thread finishes in the background (bounded by socket_timeout).
+        """
+        key = cache_key(query)
+        if not fresh:
+            info = self.cache.get(key)
+            if info:
+                return info
+
+        entry = self.inflight.get(key)
+        if entry is None:
+            task = asyncio.create_task(self._lookup(guild_id, query))
+            entry = self.inflight[key] = [task, 0]
+
+            def _done(t):
+                if self.inflight.get(key, (None,))[0] is t:
+                    del self.inflight[key]
+            task.add_done_callback(_done)
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    async def prefetch(self, guild_id, query: str):
+        """Warm the cache for an upcoming song; failures are left for playback to report."""
+        try:
+            return await self.resolve(guild_id, query)
+        except Exception:
+            return None
+
+    def is_cached(self, query: str) -> bool:
+        return cache_key(query) in self.cache
+
+    def invalidate(self, query: str):
+        """Evict a single entry, e.g. after its stream URL returned 403."""
+        info = self.cache.pop(cache_key(query))
+        if info and info.get("id"):
+            self.cache.pop("yt:" + info["id"])
+
+    def forget(self, guild_id):
+        self.semaphores.pop(guild_id, None)
+
+
+resolver = StreamResolver()
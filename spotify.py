@@ -1,37 +1,131 @@
-import requests
+import asyncio
+import time
 import discord
 from discord.ui import View, Button
 import os
 
+from cache import ResponseCache
+from http_client import http_client
+
 SPOTIFY_ARTIST_ID = "6rhenHsRHjPnQIcawW67VQ"  # Default artist for auto release
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+# Response cache TTLs (seconds); stale entries are served while a refresh runs in the background
+SPOTIFY_CACHE_MAX_KB = int(os.getenv("SPOTIFY_CACHE_MAX_KB", "4096"))
+ARTIST_TTL = 6 * 3600
+TOP_TRACKS_TTL = 15 * 60
+ALBUMS_TTL = 60 * 60
+NOT_FOUND_TTL = 5 * 60
+
+# -------------------------
+# Shared Spotify Client
+# -------------------------
+class SpotifyClient:
+    """
+    Async Spotify Web API client shared by the whole bot, on top of the shared
+    HTTP client (pooling, retries, circuit breaker). Holds one client-credentials
+    token, refreshed shortly before it expires. Concurrent callers share a single
+    refresh, and a 401 is retried once with a new token.
+    """
+    def __init__(self):
+        self.token = None
+        self.token_expires = 0.0
+        self.token_lock = asyncio.Lock()
+
+    def _token_valid(self):
+        return self.token and time.monotonic() < self.token_expires - 60
+
+    async def get_token(self):
+        if self._token_valid():
+            return self.token
+        async with self.token_lock:
+            if not self._token_valid():  # another caller may have refreshed while we waited
+                await self._refresh_token()
+        return self.token
+
+    async def _refresh_token(self):
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": os.getenv("SPOTIFY_CLIENT_ID"),
+            "client_secret": os.getenv("SPOTIFY_CLIENT_SECRET")
+        }
+        # Refreshing a token has no side effects, so it may be retried like a GET
+        resp = await http_client.post(SPOTIFY_TOKEN_URL, data=data, retries=http_client.retries)
+        payload = resp.json()
+        self.token = payload["access_token"]
+        self.token_expires = time.monotonic() + payload.get("expires_in", 3600)
+
+    async def get(self, path, **params):
+        """GET an API path such as "/artists/{id}"; raises aiohttp.ClientError on errors."""
+        for attempt in range(2):
+            token = await self.get_token()
+            headers = {"Authorization": f"Bearer {token}"}
+            resp = await http_client.get(
+                SPOTIFY_API_URL + path, headers=headers, params=params, accept=(401,) if attempt == 0 else ()
+            )
+            if resp.status == 401:
+                if self.token == token:
+                    self.token = None  # revoked or expired early: force one refresh
+                continue
+            return resp.json()
+
+
+spotify_client = SpotifyClient()
+response_cache = ResponseCache(max_bytes=SPOTIFY_CACHE_MAX_KB * 1024)
+
+
+def normalize_name(name: str) -> str:
+    """"Adele", "adele " and "ADELE" all share one cache entry."""
+    return " ".join(name.lower().split())
 
-def get_spotify_token():
-    SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
-    SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
-    url = "https://accounts.spotify.com/api/token"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": SPOTIFY_CLIENT_ID,
-        "client_secret": SPOTIFY_CLIENT_SECRET
-    }
-    response = requests.post(url, headers=headers, data=data)
-    return response.json().get("access_token")
-
-
-def get_latest_albums(artist_id, token, limit=5):
+# -------------------------
+# Cached Lookups
+# -------------------------
+async def find_artist(artist_name):
+    """Best matching artist object for a name, or None."""
+    async def fetch():
+        resp = await spotify_client.get("/search", q=artist_name.strip(), type="artist", limit=1)
+        items = resp.get("artists", {}).get("items", [])
+        return items[0] if items else None
+
+    return await response_cache.get_or_fetch(
+        "artist:" + normalize_name(artist_name), fetch,
+        ttl=lambda artist: ARTIST_TTL if artist else NOT_FOUND_TTL, stale_ttl=ARTIST_TTL
+    )
+
+
+async def get_top_tracks(artist_id, limit=5):
+    """Top tracks formatted as embed lines."""
+    async def fetch():
+        data = await spotify_client.get(f"/artists/{artist_id}/top-tracks", market="US")
+        return [
+            f"🎵 [{t['name']}]({t['external_urls']['spotify']})"
+            for t in data.get("tracks", [])[:limit]
+        ]
+
+    return await response_cache.get_or_fetch(
+        f"top:{artist_id}:{limit}", fetch, ttl=TOP_TRACKS_TTL, stale_ttl=ARTIST_TTL
+    )
+
+async def get_latest_albums(artist_id, limit=5):
     """Get latest albums with at least 3 tracks."""
-    url = f"https://api.spotify.com/v1/artists/{artist_id}/albums"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"include_groups": "album,single", "limit": limit*2, "market": "US"}
-    response = requests.get(url, headers=headers, params=params)
-    albums_data = response.json().get("items", [])
+    return await response_cache.get_or_fetch(
+        f"albums:{artist_id}:{limit}", lambda: _fetch_latest_albums(artist_id, limit),
+        ttl=ALBUMS_TTL, stale_ttl=ARTIST_TTL
+    )
+
+
+async def _fetch_latest_albums(artist_id, limit):
+    response = await spotify_client.get(
+        f"/artists/{artist_id}/albums", include_groups="album,single", limit=limit*2, market="US"
+    )
+    albums_data = response.get("items", [])
     latest_albums = []
 
+    # The album listing already carries total_tracks, so no per-album lookups are needed
     for album in albums_data:
-        album_url = f"https://api.spotify.com/v1/albums/{album['id']}"
-        album_res = requests.get(album_url, headers=headers).json()
-        track_count = album_res.get("total_tracks", 0)
+        track_count = album.get("total_tracks", 0)
         if track_count >= 3:
             album_name = album["name"]
             album_link = album["external_urls"]["spotify"]
@@ -42,7 +136,7 @@ def get_latest_albums(artist_id, token, limit=5):
     return latest_albums
 
 
-def create_spotify_artist_embed(artist_data, top_tracks, latest_albums, role_mention="<@&1407630846294491168>"):
+def create_spotify_artist_embed(artist_data, top_tracks, latest_albums, role_mention=""):
     """Create a rich Discord embed for Spotify artist search."""
     embed = discord.Embed(
         title=artist_data.get("name", "Artist"),
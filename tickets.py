@@ -2,16 +2,368 @@ import discord
 from discord.ext import commands
 from discord.ui import View, Button
 import asyncio
+import heapq
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from guild_config import guild_config, config_channel
+from pacing import Pacer
 
 # -------------------------
 # Ticket Config
 # -------------------------
-MODERATOR_ROLE_ID = 1407630846294491169
-ARTIST_ROLE_ID = 1407630978469466112
-ADMIN_ROLE_ID = 1407630846294491170
-TICKET_CHANNEL_ID = 1407630847703781427
-TICKET_LOG_CHANNEL_ID = 1407656944164016138
-TICKET_TIMEOUT = 3600  # 1 hour
+TICKET_TIMEOUT = 3600  # 1 hour of inactivity
+TICKET_WARNING = 300   # warn 5 minutes before closing
+TICKET_STATE_PATH = os.getenv("TICKET_STATE_PATH", "tickets.db")
+TICKET_FLUSH_INTERVAL = 10  # seconds; deadline changes are written in batches
+TICKET_WORKERS = 2            # tickets created concurrently
+TICKET_QUEUE_SIZE = 100       # waiting ticket requests before new ones are turned away
+TICKET_CREATE_SPACING = 0.5   # seconds between thread creations, to stay under Discord's bucket
+TICKET_LOG_INTERVAL = 5       # seconds; log lines are sent in batches
+OPENING = 0                   # per-user index marker while that user's ticket is being created
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    thread_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    ticket_type TEXT NOT NULL,
+    deadline REAL NOT NULL,
+    warned INTEGER NOT NULL DEFAULT 0,
+    guild_id INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# -------------------------
+# Ticket Deadline Store
+# -------------------------
+class Ticket:
+    __slots__ = ("thread_id", "guild_id", "user_id", "ticket_type", "deadline", "warned")
+
+    def __init__(self, thread_id, guild_id, user_id, ticket_type, deadline, warned=False):
+        self.thread_id = thread_id
+        self.guild_id = guild_id  # 0 for tickets saved before this was stored; rebuild() fills it in
+        self.user_id = user_id
+        self.ticket_type = ticket_type
+        self.deadline = deadline  # wall-clock close time, so it survives restarts
+        self.warned = warned
+
+    @property
+    def owner(self):
+        return (self.guild_id, self.user_id)
+
+    def row(self):
+        return (self.thread_id, self.guild_id, self.user_id, self.ticket_type, self.deadline, int(self.warned))
+
+
+class TicketStore:
+    """Open tickets and their deadlines in SQLite; writes run on a worker thread."""
+    def __init__(self, path=TICKET_STATE_PATH):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tickets")
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(tickets)")}
+        if "guild_id" not in columns:
+            self.db.execute("ALTER TABLE tickets ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0")
+            self.db.commit()
+
+    def load_all(self):
+        rows = self.db.execute("SELECT thread_id, guild_id, user_id, ticket_type, deadline, warned FROM tickets").fetchall()
+        return [Ticket(tid, gid, uid, kind, deadline, bool(warned)) for tid, gid, uid, kind, deadline, warned in rows]
+
+    async def write(self, rows, removed):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._write, rows, [(tid,) for tid in removed])
+
+    def _write(self, rows, removed):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO tickets (thread_id, guild_id, user_id, ticket_type, deadline, warned) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        self.db.executemany("DELETE FROM tickets WHERE thread_id = ?", removed)
+        self.db.commit()
+
+# -------------------------
+# Ticket Scheduler
+# -------------------------
+class TicketScheduler:
+    """
+    Inactivity warnings and auto-closes for every open ticket, driven by one task
+    and one heap of (due, thread_id, deadline) holding one entry per ticket.
+    Activity only moves the ticket's deadline (O(1)); when its outdated entry
+    surfaces it is re-pushed at the new time (O(log n)). Deadlines are persisted
+    in batches and restored on startup.
+    """
+    def __init__(self, store=None):
+        self.store = store
+        self.bot = None
+        self.tickets = {}   # thread_id -> Ticket
+        self.by_user = {}   # (guild_id, user_id) -> thread_id (or OPENING) of their open ticket
+        self.heap = []
+        self.dirty = set()
+        self.removed = set()
+        self.flush_at = None  # when pending dirty/removed changes are due on disk
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def start(self, bot):
+        """Restore saved tickets and run the scheduler; safe to call again on reconnect."""
+        self.bot = bot
+        if self.store is None:
+            self.store = TicketStore()
+            now = time.time()
+            for ticket in self.store.load_all():
+                if not ticket.warned and ticket.deadline - TICKET_WARNING < now:
+                    ticket.deadline = now + TICKET_WARNING  # overdue while offline: warn before closing
+                    self.dirty.add(ticket.thread_id)
+                    self._changed()
+                self.tickets[ticket.thread_id] = ticket
+                self.by_user[ticket.owner] = ticket.thread_id
+                self._push(ticket)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def _push(self, ticket):
+        due = ticket.deadline if ticket.warned else ticket.deadline - TICKET_WARNING
+        heapq.heappush(self.heap, (due, ticket.thread_id, ticket.deadline))
+        if self.heap[0][1] == ticket.thread_id:
+            self.wakeup.set()  # new earliest entry: the loop is sleeping for too long
+
+    def _changed(self):
+        """A ticket was marked dirty or removed: make sure the loop writes it within the flush interval."""
+        if self.flush_at is None:
+            self.flush_at = time.time() + TICKET_FLUSH_INTERVAL
+            self.wakeup.set()
+
+    def add(self, thread_id, guild_id, user_id, ticket_type):
+        ticket = self.tickets[thread_id] = Ticket(thread_id, guild_id, user_id, ticket_type, time.time() + TICKET_TIMEOUT)
+        self.by_user[ticket.owner] = thread_id
+        self.dirty.add(thread_id)
+        self.removed.discard(thread_id)
+        self._changed()
+        self._push(ticket)
+
+    def touch(self, thread_id):
+        """Activity in a ticket thread: push its deadline back a full timeout."""
+        ticket = self.tickets.get(thread_id)
+        if ticket is None:
+            return
+        ticket.deadline = time.time() + TICKET_TIMEOUT
+        ticket.warned = False
+        self.dirty.add(thread_id)
+        self._changed()
+
+    def remove(self, thread_id):
+        ticket = self.tickets.pop(thread_id, None)
+        if ticket:
+            if self.by_user.get(ticket.owner) == thread_id:
+                del self.by_user[ticket.owner]
+            self.dirty.discard(thread_id)
+            self.removed.add(thread_id)
+            self._changed()
+
+    async def rebuild(self, bot):
+        """
+        Reconcile saved tickets with the ticket threads that are actually active:
+        closed-while-offline tickets are dropped and open ones the store doesn't
+        know about are adopted, so the per-user index is right from the start.
+        """
+        await bot.wait_until_ready()
+        active = {t.id: t for guild in bot.guilds for t in guild.threads if not t.archived}
+        for thread_id in [tid for tid in self.tickets if tid not in active]:
+            self.remove(thread_id)
+        for ticket in self.tickets.values():
+            if ticket.guild_id != active[ticket.thread_id].guild.id:  # saved before guild_id was stored
+                if self.by_user.get(ticket.owner) == ticket.thread_id:
+                    del self.by_user[ticket.owner]
+                ticket.guild_id = active[ticket.thread_id].guild.id
+                self.by_user[ticket.owner] = ticket.thread_id
+                self.dirty.add(ticket.thread_id)
+                self._changed()
+        ticket_channels = {guild_config.get(guild.id, "ticket_channel") for guild in bot.guilds}
+        for thread in active.values():
+            if thread.id in self.tickets or thread.parent_id not in ticket_channels:
+                continue
+            user_id = await self._owner(thread, bot.user.id)
+            if user_id is not None and (thread.guild.id, user_id) not in self.by_user:
+                self.add(thread.id, thread.guild.id, user_id, thread.name.split(" - ", 1)[0])
+
+    async def _owner(self, thread, bot_id):
+        """
+        The user our intro message greets. Thread members can't tell us: staff
+        join ticket threads too, and fetch_members() comes back in no set order.
+        """
+        try:
+            async for message in thread.history(limit=10, oldest_first=True):
+                if message.author.id == bot_id and message.raw_mentions:
+                    return message.raw_mentions[0]
+        except discord.HTTPException:
+            pass
+        return None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._flush()
+                now = time.time()
+                while self.heap and self.heap[0][0] <= now:
+                    _, thread_id, deadline = heapq.heappop(self.heap)
+                    ticket = self.tickets.get(thread_id)
+                    if ticket is None:
+                        continue  # closed since this entry was queued
+                    if ticket.deadline != deadline:
+                        self._push(ticket)  # pushed back by activity since this entry was queued
+                        continue
+                    await self._fire(ticket)
+                wait = self.heap[0][0] - time.time() if self.heap else None
+                if self.flush_at is not None:
+                    flush_wait = self.flush_at - time.time()
+                    wait = flush_wait if wait is None else min(wait, flush_wait)
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Ticket scheduler error: {e}")
+                await asyncio.sleep(5)
+
+    async def _flush(self):
+        if self.flush_at is None or self.flush_at > time.time():
+            return
+        self.flush_at = None
+        if not self.dirty and not self.removed:
+            return
+        rows = [self.tickets[tid].row() for tid in self.dirty if tid in self.tickets]
+        removed = self.removed
+        self.dirty, self.removed = set(), set()
+        await self.store.write(rows, removed)
+
+    async def _thread(self, thread_id):
+        thread = self.bot.get_channel(thread_id)
+        if thread is None:
+            try:
+                thread = await self.bot.fetch_channel(thread_id)
+            except (discord.NotFound, discord.Forbidden):
+                return None
+        return thread if isinstance(thread, discord.Thread) and not thread.archived else None
+
+    async def _fire(self, ticket):
+        thread = await self._thread(ticket.thread_id)
+        if thread is None:
+            self.remove(ticket.thread_id)  # deleted or closed by hand
+            return
+        if not ticket.warned:
+            ticket.warned = True
+            self.dirty.add(ticket.thread_id)
+            self._changed()
+            self._push(ticket)
+            try:
+                await thread.send(f"⚠ This {ticket.ticket_type} ticket will be closed in 5 minutes due to inactivity.")
+            except discord.errors.Forbidden:
+                self.remove(ticket.thread_id)
+            return
+
+        self.remove(ticket.thread_id)
+        try:
+            await thread.edit(archived=True, locked=True)
+            ticket_log.add(thread.guild, f"📝 {ticket.ticket_type} ticket `{thread.name}` auto-closed due to inactivity.")
+        except discord.errors.Forbidden:
+            pass
+
+
+ticket_scheduler = TicketScheduler()
+
+# -------------------------
+# Ticket Work Queue
+# -------------------------
+class TicketWorkQueue:
+    """
+    Bounded queue of ticket jobs run by a few workers. Thread creations are
+    spaced out so a burst of clicks becomes a steady trickle of API calls
+    instead of a pile of requests waiting on the same rate-limit bucket.
+    """
+    def __init__(self, workers=TICKET_WORKERS, maxsize=TICKET_QUEUE_SIZE, spacing=TICKET_CREATE_SPACING):
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize)
+        self.pacer = Pacer(spacing)
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [t for t in self.tasks if not t.done()]
+        while len(self.tasks) < self.workers:
+            self.tasks.append(asyncio.create_task(self._worker()))
+
+    def submit(self, job) -> bool:
+        """Queue an async callable; False when the queue is full."""
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def pace(self):
+        """Wait for the next thread-creation slot."""
+        await self.pacer.wait()
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await job()
+            except Exception as e:
+                print(f"❌ Ticket job failed: {e}")
+            finally:
+                self.queue.task_done()
+
+
+ticket_work = TicketWorkQueue()
+
+# -------------------------
+# Ticket Log
+# -------------------------
+class TicketLog:
+    """Log lines collected per log channel and sent as one message per interval."""
+    def __init__(self, interval=TICKET_LOG_INTERVAL):
+        self.interval = interval
+        self.lines = {}  # log channel -> [line, ...]
+        self.task = None
+
+    def add(self, guild, line):
+        channel = config_channel(guild, "ticket_log_channel")
+        if channel is None:
+            return
+        self.lines.setdefault(channel, []).append(line)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Lines added while a batch is being sent go out in the next round, since
+        # add() sees this task still running and won't start another
+        while self.lines:
+            await asyncio.sleep(self.interval)
+            batches, self.lines = self.lines, {}
+            for channel, lines in batches.items():
+                message = ""
+                for line in lines:
+                    if message and len(message) + len(line) + 1 > 2000:
+                        await self._send(channel, message)
+                        message = ""
+                    message = f"{message}\n{line}" if message else line
+                await self._send(channel, message)
+
+    async def _send(self, channel, message):
+        try:
+            await channel.send(message)
+        except discord.HTTPException as e:
+            print(f"❌ Ticket log failed: {e}")
+
+
+ticket_log = TicketLog()
 
 # -------------------------
 # Ticket Close Button
@@ -23,17 +375,15 @@ class ThreadCloseView(View):
     @discord.ui.button(label="Close Ticket", style=discord.ButtonStyle.danger, custom_id="close_ticket_btn")
     async def close_ticket_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         thread = interaction.channel
-        guild = interaction.guild
-        log_channel = guild.get_channel(TICKET_LOG_CHANNEL_ID)
 
         if isinstance(thread, discord.Thread):
-            await thread.edit(archived=True, locked=True)
-            if log_channel:
-                await log_channel.send(f"📝 Ticket `{thread.name}` closed by {interaction.user.mention}")
+            ticket_scheduler.remove(thread.id)
             try:
                 await interaction.response.send_message("✅ Ticket closed!", ephemeral=True)
             except discord.errors.Forbidden:
                 pass
+            await thread.edit(archived=True, locked=True)
+            ticket_log.add(interaction.guild, f"📝 Ticket `{thread.name}` closed by {interaction.user.mention}")
         else:
             await interaction.response.send_message("⚠️ This is not a ticket thread.", ephemeral=True)
 
@@ -53,52 +403,63 @@ class TicketOpenView(View):
         await self.create_ticket(interaction, "Cover Request")
 
     async def create_ticket(self, interaction: discord.Interaction, ticket_type: str):
-        guild = interaction.guild
-        log_channel = guild.get_channel(TICKET_LOG_CHANNEL_ID)
+        """Reject duplicates from the in-memory index, acknowledge at once, then queue the work."""
+        owner = (interaction.guild_id, interaction.user.id)
+        existing = ticket_scheduler.by_user.get(owner)
+        if existing is not None:
+            message = (
+                "⏳ Your ticket is being created, hang on!" if existing == OPENING
+                else f"⚠️ You already have an open ticket: <#{existing}>"
+            )
+            return await interaction.response.send_message(message, ephemeral=True)
+
+        ticket_scheduler.by_user[owner] = OPENING
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            if not ticket_work.submit(lambda: self.open_ticket(interaction, ticket_type)):
+                ticket_scheduler.by_user.pop(owner, None)
+                await interaction.followup.send("⏳ Lots of tickets are being opened right now, please try again in a minute.", ephemeral=True)
+        except Exception:
+            ticket_scheduler.by_user.pop(owner, None)
+            raise
+
+    async def open_ticket(self, interaction: discord.Interaction, ticket_type: str):
+        """Runs on the ticket work queue."""
+        user = interaction.user
+        owner = (interaction.guild_id, user.id)
 
         # Create private thread
-        thread = await interaction.channel.create_thread(
-            name=f"{ticket_type} - {interaction.user.display_name}",
-            type=discord.ChannelType.private_thread,
-            invitable=False
+        try:
+            await ticket_work.pace()
+            thread = await interaction.channel.create_thread(
+                name=f"{ticket_type} - {user.display_name}",
+                type=discord.ChannelType.private_thread,
+                invitable=False
+            )
+            await thread.add_user(user)
+        except Exception as e:
+            if ticket_scheduler.by_user.get(owner) == OPENING:
+                del ticket_scheduler.by_user[owner]
+            print(f"❌ Ticket creation failed for {user}: {e}")
+            await interaction.followup.send("❌ Could not create your ticket, please try again.", ephemeral=True)
+            return
+
+        # Schedule the inactivity warning and auto-close (also records the user's open ticket)
+        ticket_scheduler.add(thread.id, thread.guild.id, user.id, ticket_type)
+
+        await interaction.followup.send(
+            f"✅ Your **{ticket_type}** ticket has been created: {thread.mention}", ephemeral=True
         )
-        await thread.add_user(interaction.user)
 
         # Send intro message with close button
         await thread.send(
-            content=f"👋 Hi {interaction.user.mention}, thank you for opening a **{ticket_type}** ticket!\n"
+            content=f"👋 Hi {user.mention}, thank you for opening a **{ticket_type}** ticket!\n"
                     f"Please describe your request below.",
             view=ThreadCloseView()
         )
 
         # Log ticket
-        if log_channel:
-            await log_channel.send(
-                f"📩 New **{ticket_type}** ticket opened by {interaction.user.mention} → {thread.mention}"
-            )
-
-        # Start auto-close task
-        asyncio.create_task(self.auto_close_ticket(thread, ticket_type))
-
-        await interaction.response.send_message(
-            f"✅ Your **{ticket_type}** ticket has been created: {thread.mention}", ephemeral=True
-        )
-
-    async def auto_close_ticket(self, thread, ticket_type: str):
-        await asyncio.sleep(TICKET_TIMEOUT - 300)  # 5-minute warning
-        try:
-            await thread.send(f"⚠ This {ticket_type} ticket will be closed in 5 minutes due to inactivity.")
-        except discord.errors.Forbidden:
-            return
-
-        await asyncio.sleep(300)
-        try:
-            await thread.edit(archived=True, locked=True)
-            log_channel = thread.guild.get_channel(TICKET_LOG_CHANNEL_ID)
-            if log_channel:
-                await log_channel.send(f"📝 {ticket_type} ticket `{thread.name}` auto-closed due to inactivity.")
-        except discord.errors.Forbidden:
-            pass
+        ticket_log.add(interaction.guild, f"📩 New **{ticket_type}** ticket opened by {user.mention} → {thread.mention}")
 
 # -------------------------
 # Ticket System Cog
@@ -107,6 +468,22 @@ class TicketSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        # Any member message in an open ticket counts as activity
+        if not message.author.bot and message.channel.id in ticket_scheduler.tickets:
+            ticket_scheduler.touch(message.channel.id)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before, after):
+        # Archived by hand: free the user's slot right away
+        if after.archived and after.id in ticket_scheduler.tickets:
+            ticket_scheduler.remove(after.id)
+
+    @commands.Cog.listener()
+    async def on_raw_thread_delete(self, payload):
+        ticket_scheduler.remove(payload.thread_id)
+
     @commands.command(name="setup_tickets")
     @commands.has_permissions(administrator=True)
     async def setup_tickets_command(self, ctx):
@@ -131,3 +508,9 @@ class TicketSystem(commands.Cog):
 # -------------------------
 async def setup(bot):
     await bot.add_cog(TicketSystem(bot))
+    # Persistent views, so panel and close buttons keep working after a restart
+    bot.add_view(TicketOpenView())
+    bot.add_view(ThreadCloseView())
+    ticket_scheduler.start(bot)
+    ticket_work.start()
+    asyncio.create_task(ticket_scheduler.rebuild(bot))
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from resolver import cache_key
+
+# -------------------------
+# Track Index Config
+# -------------------------
+TRACK_INDEX_PATH = os.getenv("TRACK_INDEX_PATH", "track_index.db")
+FLUSH_DELAY = 2  # seconds; new and dropped mappings are written in batches
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spotify_tracks (
+    spotify_id TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    query TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+"""
+
+
+def watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+# -------------------------
+# Track Index
+# -------------------------
+class TrackIndex:
+    """
+    Persistent map of Spotify track IDs and normalized search queries to the
+    YouTube video they resolved to, so repeat plays skip the YouTube search.
+    Lookups are primary-key reads; writes are batched onto a worker thread.
+    """
+    def __init__(self, path=TRACK_INDEX_PATH):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="track-index")
+        self.pending_tracks = {}   # spotify_id -> video_id
+        self.pending_queries = {}  # query key -> video_id
+        self.deleted_tracks = set()   # spotify_ids whose rows are waiting to be deleted
+        self.deleted_queries = set()  # query keys whose rows are waiting to be deleted
+        self.flush_handle = None
+
+    def lookup(self, query: str, spotify_id: str = None):
+        """Return the indexed video ID for a song, or None if it still needs a search."""
+        key = cache_key(query)
+        if key.startswith("yt:"):
+            return key[3:]
+        if spotify_id and spotify_id in self.pending_tracks:
+            return self.pending_tracks[spotify_id]
+        if key in self.pending_queries:
+            return self.pending_queries[key]
+        with self.lock:
+            row = None
+            if spotify_id and spotify_id not in self.deleted_tracks:
+                row = self.db.execute("SELECT video_id FROM spotify_tracks WHERE spotify_id = ?", (spotify_id,)).fetchone()
+            if row is None and key not in self.deleted_queries:
+                row = self.db.execute("SELECT video_id FROM queries WHERE query = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def store(self, query: str, video_id: str, spotify_id: str = None):
+        key = cache_key(query)
+        if not video_id or key.startswith("yt:"):
+            return
+        self.pending_queries[key] = video_id
+        self.deleted_queries.discard(key)
+        if spotify_id:
+            self.pending_tracks[spotify_id] = video_id
+            self.deleted_tracks.discard(spotify_id)
+        self._schedule_flush()
+
+    def forget(self, query: str, spotify_id: str = None):
+        """Drop a mapping whose video went away, so the next play searches again."""
+        key = cache_key(query)
+        self.pending_queries.pop(key, None)
+        self.deleted_queries.add(key)
+        if spotify_id:
+            self.pending_tracks.pop(spotify_id, None)
+            self.deleted_tracks.add(spotify_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(FLUSH_DELAY, self._flush)
+
+    def _flush(self):
+        self.flush_handle = None
+        now = int(time.time())
+        tracks = [(sid, vid, now) for sid, vid in self.pending_tracks.items()]
+        queries = [(q, vid, now) for q, vid in self.pending_queries.items()]
+        deleted_tracks, deleted_queries = list(self.deleted_tracks), list(self.deleted_queries)
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._write, tracks, queries, deleted_tracks, deleted_queries
+        )
+        future.add_done_callback(
+            lambda f: f.exception() is None and self._written(tracks, queries, deleted_tracks, deleted_queries)
+        )
+
+    def _write(self, tracks, queries, deleted_tracks, deleted_queries):
+        with self.lock:
+            self.db.executemany("DELETE FROM spotify_tracks WHERE spotify_id = ?", [(sid,) for sid in deleted_tracks])
+            self.db.executemany("DELETE FROM queries WHERE query = ?", [(q,) for q in deleted_queries])
+            self.db.executemany("INSERT OR REPLACE INTO spotify_tracks VALUES (?, ?, ?)", tracks)
+            self.db.executemany("INSERT OR REPLACE INTO queries VALUES (?, ?, ?)", queries)
+            self.db.commit()
+
+    def _written(self, tracks, queries, deleted_tracks, deleted_queries):
+        """Drop flushed rows and deletes from the pending state (runs back on the event loop)."""
+        self.deleted_tracks.difference_update(deleted_tracks)
+        self.deleted_queries.difference_update(deleted_queries)
+        for sid, vid, _ in tracks:
+            if self.pending_tracks.get(sid) == vid:
+                self.pending_tracks.pop(sid, None)
+        for q, vid, _ in queries:
+            if self.pending_queries.get(q) == vid:
+                self.pending_queries.pop(q, None)
+
+
+track_index = TrackIndex()
@@ -0,0 +1,90 @@
+import asyncio
+import os
+from collections import OrderedDict
+
+import discord
+from discord.ui import View
+
+# -------------------------
+# View Registry Config
+# -------------------------
+VIEW_MAX_ACTIVE = int(os.getenv("VIEW_MAX_ACTIVE", "500"))        # live views across all guilds
+VIEW_IDLE_TIMEOUT = int(os.getenv("VIEW_IDLE_TIMEOUT", "900"))    # seconds without a click before a view expires
+
+# -------------------------
+# View Registry
+# -------------------------
+class ViewRegistry:
+    """
+    Bounds how many interactive views are alive at once. Views are kept in
+    least-recently-used order; past `max_views` the oldest one is expired, which
+    disables its buttons and lets discord.py drop it (and its ctx, pages, player).
+    """
+    def __init__(self, max_views=VIEW_MAX_ACTIVE):
+        self.max_views = max_views
+        self.views = OrderedDict()  # ManagedView -> None, oldest first
+        self.evicted = 0
+
+    def add(self, view):
+        self.views[view] = None
+        self.views.move_to_end(view)
+        while len(self.views) > self.max_views:
+            oldest, _ = self.views.popitem(last=False)
+            self.evicted += 1
+            asyncio.create_task(oldest.expire())
+
+    def touch(self, view):
+        if view in self.views:
+            self.views.move_to_end(view)
+
+    def discard(self, view):
+        self.views.pop(view, None)
+
+    def stats(self):
+        return {"active": len(self.views), "evicted": self.evicted}
+
+
+view_registry = ViewRegistry()
+
+# -------------------------
+# Managed View
+# -------------------------
+class ManagedView(View):
+    """
+    View that expires after VIEW_IDLE_TIMEOUT seconds without a click (discord.py
+    restarts the timer on every interaction) or when the registry evicts it.
+    Call `attach(message)` once the view has been sent.
+    """
+    def __init__(self, timeout=VIEW_IDLE_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.message = None
+
+    def attach(self, message):
+        self.message = message
+        view_registry.add(self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        view_registry.touch(self)
+        return True
+
+    async def on_timeout(self):
+        await self.expire()
+
+    def retire(self):
+        """Stop listening without touching the message, e.g. after it was edited to show a newer view."""
+        view_registry.discard(self)
+        View.stop(self)  # explicit: subclasses may have a button callback named `stop`
+        self.message = None
+
+    async def expire(self):
+        """Stop listening and grey out the buttons on the message."""
+        message = self.message
+        self.retire()
+        if message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await message.edit(view=self)
+        except discord.HTTPException:
+            pass
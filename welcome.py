@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import discord
+
+from guild_config import config_channel, config_role
+from pacing import Pacer
+
+# -------------------------
+# Welcome Config
+# -------------------------
+WELCOME_ROLE_WORKERS = int(os.getenv("WELCOME_ROLE_WORKERS", "4"))      # role assignments in flight at once
+WELCOME_ROLE_SPACING = float(os.getenv("WELCOME_ROLE_SPACING", "0"))      # extra seconds between assignments per guild; 0 = only Discord's limit
+WELCOME_BATCH_WINDOW = float(os.getenv("WELCOME_BATCH_WINDOW", "3"))      # seconds joins are collected for
+WELCOME_BATCH_THRESHOLD = int(os.getenv("WELCOME_BATCH_THRESHOLD", "5"))  # joins per window that switch to one message
+LAG_SAMPLES = 200
+
+# -------------------------
+# Welcome Pipeline
+# -------------------------
+class WelcomePipeline:
+    """
+    Handles joins without blocking the event handler. Role assignments go
+    through a small worker pool, so a raid is at most a few requests in flight
+    instead of hundreds stuck behind the rate limit; discord.py's per-route
+    limiter decides how fast they actually go.
+    Welcomes are collected for a short window: a few joins get their own embed,
+    a burst above the threshold gets one combined message.
+    """
+    def __init__(self, workers=WELCOME_ROLE_WORKERS, spacing=WELCOME_ROLE_SPACING,
+                 window=WELCOME_BATCH_WINDOW, threshold=WELCOME_BATCH_THRESHOLD):
+        self.workers = workers
+        self.pacer = Pacer(spacing)  # slots per guild: a raid in one guild doesn't hold up another
+        self.window = window
+        self.threshold = threshold
+        self.roles = asyncio.Queue()   # (member, queued_at)
+        self.tasks = []
+        self.pending = {}              # guild_id -> [member, ...] waiting to be welcomed
+        self.flush_tasks = {}          # guild_id -> task
+        self.lags = deque(maxlen=LAG_SAMPLES)  # seconds from join to role assigned
+        self.head_queued_at = None     # join time of the member a worker picked up last
+        self.assigned = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        self.tasks = [t for t in self.tasks if not t.done()]
+        while len(self.tasks) < self.workers:
+            self.tasks.append(asyncio.create_task(self._role_worker()))
+
+    def enqueue(self, member):
+        self.roles.put_nowait((member, time.monotonic()))
+        self.pending.setdefault(member.guild.id, []).append(member)
+        task = self.flush_tasks.get(member.guild.id)
+        if task is None or task.done():
+            self.flush_tasks[member.guild.id] = asyncio.create_task(self._flush_later(member.guild))
+
+    # --- Roles
+    async def _role_worker(self):
+        while True:
+            member, queued_at = await self.roles.get()
+            self.head_queued_at = queued_at
+            try:
+                role = config_role(member.guild, "member_role")
+                if role:
+                    await self.pacer.wait(member.guild.id)
+                    await member.add_roles(role)
+                    self.assigned += 1
+                    self.lags.append(time.monotonic() - queued_at)
+            except discord.NotFound:
+                pass  # left before we got to them
+            except discord.HTTPException as e:
+                self.failed += 1
+                print(f"Cannot assign role to {member}: {e}")
+            finally:
+                self.roles.task_done()
+
+    # --- Welcomes
+    async def _flush_later(self, guild):
+        # Joins that arrive while a batch is being sent start a new window here,
+        # since enqueue() sees this task still running and won't start another
+        while self.pending.get(guild.id):
+            await asyncio.sleep(self.window)
+            members = self.pending.pop(guild.id, [])
+            channel = config_channel(guild, "welcome_channel")
+            if not channel or not members:
+                continue
+            try:
+                if len(members) < self.threshold:
+                    for member in members:
+                        await channel.send(embed=self.welcome_embed(member))
+                else:
+                    self.batches += 1
+                    for embed in self.batch_embeds(guild, members):
+                        await channel.send(embed=embed)
+            except discord.HTTPException as e:
+                print(f"❌ Welcome message failed: {e}")
+
+    def welcome_embed(self, member):
+        embed = discord.Embed(
+            title="🎉 Welcome!",
+            description=f"👋 Hello {member.mention}, welcome to **{member.guild.name}**!",
+            color=discord.Color.green()
+        )
+        embed.set_thumbnail(url=member.display_avatar.url)
+        embed.set_footer(text="Enjoy your stay!")
+        return embed
+
+    def batch_embeds(self, guild, members):
+        """One embed per ~4000 characters of mentions."""
+        chunks, current = [], ""
+        for member in members:
+            if len(current) + len(member.mention) + 2 > 4000:
+                chunks.append(current)
+                current = ""
+            current = f"{current}, {member.mention}" if current else member.mention
+        chunks.append(current)
+        embeds = []
+        for chunk in chunks:
+            embed = discord.Embed(
+                title=f"🎉 Welcome to {guild.name}!",
+                description=f"👋 Hello {chunk}!",
+                color=discord.Color.green()
+            )
+            embed.set_footer(text=f"{len(members)} new members • Enjoy your stay!")
+            embeds.append(embed)
+        return embeds
+
+    # --- Metrics
+    def stats(self):
+        lags = sorted(self.lags)
+        return {
+            "role_queue": self.roles.qsize(),
+            "current_lag": round(time.monotonic() - self.head_queued_at, 1) if self.roles.qsize() else 0.0,
+            "lag_p50": round(lags[len(lags) // 2], 2) if lags else 0.0,
+            "lag_max": round(lags[-1], 2) if lags else 0.0,
+            "assigned": self.assigned,
+            "failed": self.failed,
+            "welcomes_pending": sum(len(m) for m in self.pending.values()),
+            "batches": self.batches,
+        }
@@ -1,34 +1,137 @@
 # youtube.py
 
-import requests
+import asyncio
+import random
+import time
+import xml.etree.ElementTree as ET
 import discord
 from discord.ui import View, Button
 import os
 
+from cursors import cursors, newer_than
+from http_client import http_client
+
 # Load YouTube API key from environment
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+YOUTUBE_POLL_INTERVAL = int(os.getenv("YOUTUBE_POLL_INTERVAL", "600"))  # seconds between polls per channel
+
+PLAYLIST_ITEMS_URL = "https://www.googleapis.com/youtube/v3/playlistItems"
+CHANNELS_URL = "https://www.googleapis.com/youtube/v3/channels"
+FEED_URL = "https://www.youtube.com/feeds/videos.xml"
+FEED_NS = {"atom": "http://www.w3.org/2005/Atom", "yt": "http://www.youtube.com/xml/schemas/2015", "media": "http://search.yahoo.com/mrss/"}
+
 
+def video_from_playlist_item(item: dict) -> dict:
+    """Normalize a playlistItems entry to the {"id": {"videoId"}, "snippet"} shape the embeds use."""
+    snippet = item.get("snippet", {})
+    video_id = item.get("contentDetails", {}).get("videoId") or snippet.get("resourceId", {}).get("videoId")
+    return {"id": {"videoId": video_id}, "snippet": snippet}
 
-def get_latest_video(channel_id: str):
+
+def video_from_feed_entry(entry) -> dict:
+    group = entry.find("media:group", FEED_NS)
+    thumbnail = group.find("media:thumbnail", FEED_NS) if group is not None else None
+    description = group.findtext("media:description", "", FEED_NS) if group is not None else ""
+    return {
+        "id": {"videoId": entry.findtext("yt:videoId", None, FEED_NS)},
+        "snippet": {
+            "title": entry.findtext("atom:title", "New Video", FEED_NS),
+            "description": description,
+            "publishedAt": entry.findtext("atom:published", "", FEED_NS),
+            "thumbnails": {"high": {"url": thumbnail.get("url")}} if thumbnail is not None else {},
+        },
+    }
+
+# -------------------------
+# Upload Watcher
+# -------------------------
+class UploadWatcher:
     """
-    Fetch the latest video from a YouTube channel.
-    Returns a dict with 'videoId' and 'snippet', or None if not found.
+    Detects new uploads for many channels. With an API key it reads each channel's
+    uploads playlist (1 quota unit instead of 100 for search.list); without one it
+    reads the public Atom feed (no quota). Every request is conditional on the last
+    ETag, so an unchanged channel costs a 304 and no parsing. Polls are spread
+    evenly over the interval. `on_upload(video)` is awaited for every new video.
     """
-    url = (
-        f"https://www.googleapis.com/youtube/v3/search"
-        f"?key={YOUTUBE_API_KEY}&channelId={channel_id}"
-        f"&part=snippet,id&order=date&maxResults=1&type=video"
-    )
-    try:
-        response = requests.get(url)
-        data = response.json()
-        items = data.get("items", [])
-        if not items:
+    def __init__(self, on_upload, channel_ids, interval=YOUTUBE_POLL_INTERVAL, api_key=YOUTUBE_API_KEY):
+        self.on_upload = on_upload
+        self.channel_ids = [c.strip() for c in channel_ids if c.strip()]
+        self.interval = interval
+        self.api_key = api_key
+        self.etags = {}      # channel_id -> ETag of the last 200 response
+        self.playlists = {}  # channel_id -> uploads playlist ID
+        self.task = None
+
+    def start(self):
+        if self.channel_ids and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            step = self.interval / len(self.channel_ids)
+            for i, channel_id in enumerate(self.channel_ids):
+                wait = started + i * step + random.uniform(0, step * 0.2) - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    await self.check(channel_id)
+                except Exception as e:
+                    print(f"❌ YouTube check failed for {channel_id}: {e}")
+            await asyncio.sleep(max(started + self.interval - time.monotonic(), 0))
+
+    async def uploads_playlist(self, channel_id):
+        if channel_id not in self.playlists:
+            if channel_id.startswith("UC"):
+                self.playlists[channel_id] = "UU" + channel_id[2:]
+            else:
+                params = {"part": "contentDetails", "id": channel_id, "key": self.api_key}
+                resp = await http_client.get(CHANNELS_URL, params=params)
+                items = resp.json().get("items", [])
+                if not items:
+                    return None
+                self.playlists[channel_id] = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        return self.playlists[channel_id]
+
+    async def fetch_videos(self, channel_id):
+        """Newest-first videos, or None when nothing changed since the last poll (304)."""
+        headers = {"If-None-Match": self.etags[channel_id]} if channel_id in self.etags else {}
+        if self.api_key:
+            playlist_id = await self.uploads_playlist(channel_id)
+            if not playlist_id:
+                return None
+            params = {"part": "snippet,contentDetails", "playlistId": playlist_id, "maxResults": 10, "key": self.api_key}
+            url = PLAYLIST_ITEMS_URL
+        else:
+            params = {"channel_id": channel_id}
+            url = FEED_URL
+        resp = await http_client.get(url, params=params, headers=headers, accept=(304,))
+        if resp.status == 304:
             return None
-        return items[0]
-    except Exception as e:
-        print(f"❌ YouTube API Error: {e}")
-        return None
+        if resp.headers.get("ETag"):
+            self.etags[channel_id] = resp.headers["ETag"]
+        if self.api_key:
+            items = resp.json().get("items", [])
+            return [video_from_playlist_item(item) for item in items]
+        root = ET.fromstring(resp.body)
+        return [video_from_feed_entry(entry) for entry in root.findall("atom:entry", FEED_NS)]
+
+    async def check(self, channel_id):
+        """Announce, oldest first, every upload newer than the channel's saved cursor."""
+        videos = await self.fetch_videos(channel_id)
+        if not videos:
+            return
+        key = f"youtube:{channel_id}"
+        new, cursor = newer_than(
+            [v for v in videos if v["id"].get("videoId")], cursors.get(key),
+            lambda v: v["id"]["videoId"], lambda v: v["snippet"].get("publishedAt", "")
+        )
+        for video in new:
+            try:
+                await self.on_upload(video)
+            except Exception as e:
+                print(f"❌ YouTube announcement failed for {video['id']['videoId']}: {e}")
+        cursors.set(key, cursor)
 
 
 def create_youtube_video_embed(video: dict, role_mention: str = None) -> discord.Embed: